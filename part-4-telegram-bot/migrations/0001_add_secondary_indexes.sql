@@ -0,0 +1,13 @@
+CREATE INDEX IF NOT EXISTS courses_author_id_idx ON courses(author_id);
+
+CREATE INDEX IF NOT EXISTS articles_course_id_idx ON articles(course_id);
+
+CREATE INDEX IF NOT EXISTS comments_parent_article_id_idx ON comments(parent_article_id);
+CREATE INDEX IF NOT EXISTS comments_parent_comment_id_idx ON comments(parent_comment_id);
+CREATE INDEX IF NOT EXISTS comments_author_id_idx ON comments(author_id);
+
+CREATE INDEX IF NOT EXISTS images_article_id_idx ON images(article_id);
+
+-- частичный индекс по ещё не доставленным уведомлениям:
+-- доставленные уведомления только накапливаются и не должны замедлять опрос ботом
+CREATE INDEX IF NOT EXISTS notifications_pending_idx ON notifications(id) WHERE NOT delivered;
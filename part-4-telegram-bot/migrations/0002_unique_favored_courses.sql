@@ -0,0 +1,12 @@
+-- до появления уникального индекса курс можно было добавить в избранное несколько раз
+DELETE FROM courses_favored_by_users
+WHERE id NOT IN (
+    SELECT MIN(id)
+    FROM courses_favored_by_users
+    GROUP BY user_id, course_id
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS courses_favored_by_users_user_id_course_id_idx
+    ON courses_favored_by_users(user_id, course_id);
+CREATE INDEX IF NOT EXISTS courses_favored_by_users_course_id_idx
+    ON courses_favored_by_users(course_id);
@@ -0,0 +1,22 @@
+-- статья, к которой относится вся ветка комментариев:
+-- позволяет найти статью для ответа любой глубины одним запросом по индексу,
+-- не поднимаясь по цепочке parent_comment_id
+ALTER TABLE comments ADD COLUMN root_article_id INTEGER REFERENCES articles(id);
+
+WITH RECURSIVE thread (id, root_article_id) AS (
+    SELECT id, parent_article_id
+    FROM comments
+    WHERE parent_article_id IS NOT NULL
+    UNION ALL
+    SELECT c.id, t.root_article_id
+    FROM comments AS c
+        JOIN thread AS t ON c.parent_comment_id = t.id
+)
+UPDATE comments
+SET root_article_id = (
+    SELECT t.root_article_id
+    FROM thread AS t
+    WHERE t.id = comments.id
+);
+
+CREATE INDEX IF NOT EXISTS comments_root_article_id_idx ON comments(root_article_id);
@@ -0,0 +1,83 @@
+-- счётчики подписчиков и статей курса и комментариев к статье:
+-- страницы со списками читают готовые значения вместо COUNT(*) для каждого курса и статьи,
+-- а поддерживают значения триггеры, поэтому их не нужно обновлять в каждой функции записи
+ALTER TABLE courses ADD COLUMN favored_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE courses ADD COLUMN articles_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE articles ADD COLUMN comments_count INTEGER NOT NULL DEFAULT 0;
+
+UPDATE courses
+SET favored_count = (
+        SELECT COUNT(*)
+        FROM courses_favored_by_users AS f
+        WHERE f.course_id = courses.id
+    ),
+    articles_count = (
+        SELECT COUNT(*)
+        FROM articles AS a
+        WHERE a.course_id = courses.id
+    );
+
+-- учитываются все неудалённые комментарии статьи, включая ответы на комментарии любой глубины
+UPDATE articles
+SET comments_count = (
+    SELECT COUNT(*)
+    FROM comments AS c
+    WHERE c.root_article_id = articles.id AND NOT c.deleted
+);
+
+CREATE TRIGGER IF NOT EXISTS courses_favored_count_insert
+AFTER INSERT ON courses_favored_by_users
+BEGIN
+    UPDATE courses SET favored_count = favored_count + 1 WHERE id = NEW.course_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS courses_favored_count_delete
+AFTER DELETE ON courses_favored_by_users
+BEGIN
+    UPDATE courses SET favored_count = favored_count - 1 WHERE id = OLD.course_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS courses_articles_count_insert
+AFTER INSERT ON articles
+BEGIN
+    UPDATE courses SET articles_count = articles_count + 1 WHERE id = NEW.course_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS courses_articles_count_update
+AFTER UPDATE OF course_id ON articles
+WHEN NEW.course_id IS NOT OLD.course_id
+BEGIN
+    UPDATE courses SET articles_count = articles_count - 1 WHERE id = OLD.course_id;
+    UPDATE courses SET articles_count = articles_count + 1 WHERE id = NEW.course_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS courses_articles_count_delete
+AFTER DELETE ON articles
+BEGIN
+    UPDATE courses SET articles_count = articles_count - 1 WHERE id = OLD.course_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS articles_comments_count_insert
+AFTER INSERT ON comments
+WHEN NOT NEW.deleted
+BEGIN
+    UPDATE articles SET comments_count = comments_count + 1 WHERE id = NEW.root_article_id;
+END;
+
+-- удаление комментария только помечает его (deleted = 1), поэтому счётчик меняется и при обновлении
+CREATE TRIGGER IF NOT EXISTS articles_comments_count_update
+AFTER UPDATE OF deleted, root_article_id ON comments
+WHEN NEW.deleted IS NOT OLD.deleted OR NEW.root_article_id IS NOT OLD.root_article_id
+BEGIN
+    UPDATE articles SET comments_count = comments_count - 1
+    WHERE id = OLD.root_article_id AND NOT OLD.deleted;
+    UPDATE articles SET comments_count = comments_count + 1
+    WHERE id = NEW.root_article_id AND NOT NEW.deleted;
+END;
+
+CREATE TRIGGER IF NOT EXISTS articles_comments_count_delete
+AFTER DELETE ON comments
+WHEN NOT OLD.deleted
+BEGIN
+    UPDATE articles SET comments_count = comments_count - 1 WHERE id = OLD.root_article_id;
+END;
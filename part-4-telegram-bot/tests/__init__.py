@@ -1,7 +1,14 @@
+import re
 import unittest
+from contextlib import contextmanager
+from unittest import mock
 
 from webapp import create_app
-from webapp.db import init_db
+from webapp.db import init_db, close_pools, instrumentation
+from webapp.db.instrumentation import normalize_sql
+from webapp.models import same_models
+
+original_record_query = instrumentation.record_query
 
 
 class BaseTestCase(unittest.TestCase):
@@ -12,5 +19,42 @@ class BaseTestCase(unittest.TestCase):
             "TEST": True
         })
 
+    def tearDown(self):
+        close_pools(self.app)
+
     def create_data(self):
         init_db()
+
+    def assertSameModels(self, first, second):
+        """
+        Проверить, что объекты моделей (или списки, кортежи и словари с ними) совпадают не только по id,
+            но и по значениям всех полей, включая поля вложенных объектов
+        """
+        if not same_models(first, second):
+            self.fail(f"{first!r} and {second!r} differ in fields")
+
+    @contextmanager
+    def assertMaxQueries(self, max_queries: int):
+        """
+        Проверить, что внутри блока with к тестовой базе данных выполнено не больше max_queries запросов.
+        Управляющие транзакциями выражения (BEGIN, COMMIT и т.п.) не учитываются.
+        Запросы считаются по вызовам execute, executemany и executescript курсоров приложения,
+            а не через trace callback SQLite: он сообщает о каждом срабатывании триггера
+            как о повторном выполнении вызвавшего его запроса.
+            Поэтому executescript учитывается как один запрос, сколько бы выражений он ни содержал
+        """
+        statements = []
+
+        def record(sql, duration):
+            if not _TRANSACTION_CONTROL.match(sql):
+                statements.append(normalize_sql(sql))
+            original_record_query(sql, duration)
+
+        with mock.patch.object(instrumentation, "record_query", record):
+            yield statements
+        if len(statements) > max_queries:
+            self.fail(f"{len(statements)} queries executed, expected at most {max_queries}:\n"
+                      + "\n".join(statements))
+
+
+_TRANSACTION_CONTROL = re.compile(r"^\s*(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE)\b", re.IGNORECASE)
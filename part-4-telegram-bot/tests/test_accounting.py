@@ -1,6 +1,9 @@
 from tests import BaseTestCase
 from webapp.db.accounting import AlreadyRegisteredException, register_user, \
-    find_user_with_email
+    find_user_with_email, find_user_with_id, invalidate_user
+from webapp.db.courses import add_course, add_article, left_comment_for, delete_comment
+from webapp.db.notifications import connect_telegram
+from webapp.db.profile import find_profile_summary
 
 
 class AccountingTests(BaseTestCase):
@@ -10,8 +13,9 @@ class AccountingTests(BaseTestCase):
         with self.app.app_context():
             self.create_data()
             self.assertIsNone(find_user_with_email(email))
-            register_user(login, email, password)
+            registered_user = register_user(login, email, password)
             user = find_user_with_email(email)
+            self.assertSameModels(registered_user, user)
             self.assertEqual(login, user.login)
             self.assertEqual(email, user.email)
             self.assertTrue(user.check_password(password))
@@ -33,3 +37,59 @@ class AccountingTests(BaseTestCase):
             register_user(first_login, first_email, first_password)
             self.assertRaises(AlreadyRegisteredException,
                               register_user, second_login, second_email, second_password)
+
+    def test_users_loaded_once_per_request(self):
+        with self.app.app_context():
+            self.create_data()
+            register_user("ivan", "ivan@mail.com", "qwerty123")
+            user_id = find_user_with_email("ivan@mail.com").id
+        with self.app.app_context():
+            with self.assertMaxQueries(1):
+                user = find_user_with_id(user_id)
+                self.assertIs(user, find_user_with_id(user_id))
+            invalidate_user(user_id)
+            with self.assertMaxQueries(1):
+                reloaded_user = find_user_with_id(user_id)
+            self.assertIsNot(user, reloaded_user)
+            self.assertSameModels(user, reloaded_user)
+            self.assertFalse(hasattr(user, "__dict__"))
+        with self.app.app_context():
+            self.assertIsNot(user, find_user_with_id(user_id))
+
+    def test_profile_summary(self):
+        with self.app.app_context():
+            self.create_data()
+            user = register_user("ivan", "ivan@mail.com", "qwerty123")
+            self.assertIsNone(find_profile_summary(user, 2).telegram_account)
+            courses = [add_course(f"Course #{i}", "Description", user) for i in range(3)]
+            article = add_article("Article", "Text", courses[0], user)
+            comments = [left_comment_for(f"Comment #{i}", article, user) for i in range(3)]
+            long_comment = left_comment_for("Очень длинный комментарий к статье о программировании", article, user)
+            delete_comment(comments[2], user)
+            connect_telegram(user, 1001, "ivan")
+            with self.assertMaxQueries(1):
+                summary = find_profile_summary(user, 2)
+            self.assertEqual(courses[:2], summary.courses)
+            self.assertTrue(summary.has_more_courses)
+            self.assertEqual([long_comment.id, comments[1].id], [c.id for c in summary.comments])
+            self.assertTrue(summary.has_more_comments)
+            snippet = summary.comments[0]
+            self.assertEqual(("Очень длинный комментарий к ст", True), (snippet.text, snippet.truncated))
+            self.assertEqual((article.id, "Article", courses[0].id),
+                             (snippet.article_id, snippet.article_title, snippet.course_id))
+            self.assertEqual(("Comment #1", False), (summary.comments[1].text, summary.comments[1].truncated))
+            self.assertEqual((1001, "ivan"),
+                             (summary.telegram_account.telegram_user_id, summary.telegram_account.username))
+            self.assertSameModels(user, summary.telegram_account.user)
+            summary = find_profile_summary(user, 2, courses_after=courses[1].id, comments_before=comments[1].id)
+            self.assertEqual(courses[2:], summary.courses)
+            self.assertEqual([comments[0].id], [c.id for c in summary.comments])
+            self.assertFalse(summary.has_more_courses or summary.has_more_comments)
+            self.app.config["PAGE_SIZE"] = 1
+            client = self.app.test_client()
+            with client.session_transaction() as session:
+                session["_user_id"] = str(user.id)
+            response = client.get(f"/profile/?courses_after={courses[0].id}&comments_before={long_comment.id}")
+            page = response.get_data(as_text=True)
+            self.assertIn(f"courses_after={courses[1].id}&amp;comments_before={long_comment.id}", page)
+            self.assertIn(f"courses_after={courses[0].id}&amp;comments_before={comments[1].id}", page)
@@ -1,3 +1,7 @@
+from unittest import mock
+
+from werkzeug.local import LocalProxy
+
 from tests import BaseTestCase
 from webapp import add_course, find_all_courses, register_user, find_user_with_email
 from webapp.db.courses import find_courses_created_by, add_article, \
@@ -6,7 +10,10 @@ from webapp.db.courses import find_courses_created_by, add_article, \
     reply_at_comment, delete_comment, find_comments_left_by, \
     StudentsCannotReplyAtComments, StudentsCannotDeleteComments, \
     remove_from_favored_courses, StudentsCannotCreateArticles, CourseAlreadyExists, \
-    edit_article, find_users_favoring_course
+    edit_article, find_users_favoring_course, find_comment_tree_for, find_all_courses_for, \
+    find_courses_with_ids, find_articles_with_ids, find_article_in_course, find_comment_location, \
+    find_course_with_id, find_article_with_id
+from webapp.models.courses import Course, Comment
 
 
 class TestCourses(BaseTestCase):
@@ -28,7 +35,54 @@ class TestCourses(BaseTestCase):
             course = courses[0]
             self.assertEqual(course_title, course.title)
             self.assertEqual(course_description, course.description)
-            self.assertEqual(self.teacher, course.author)
+            self.assertSameModels(self.teacher, course.author)
+
+    def test_created_entities_returned(self):
+        with self.app.app_context():
+            self.create_data()
+            course = add_course("First course", "My first programming course", self.teacher)
+            self.assertSameModels(find_courses_created_by(self.teacher), [course])
+            article = add_article("Article #1", "Article about programming", course, self.teacher)
+            self.assertSameModels(find_articles_for(course), [article])
+            comment = left_comment_for("Comment", article, self.student)
+            self.assertSameModels(find_comments_left_for(article), [comment])
+
+    def test_counters(self):
+        with self.app.app_context():
+            self.create_data()
+            course = add_course("First course", "My first programming course", self.teacher)
+            add_to_favored_courses(course, self.student)
+            add_to_favored_courses(course, self.teacher)
+            remove_from_favored_courses(course, self.teacher)
+            article = add_article("Article #1", "Article about programming", course, self.teacher)
+            add_article("Article #2", "Article about programming", course, self.teacher)
+            comment = left_comment_for("Comment", article, self.student)
+            reply_at_comment("Reply", comment, self.teacher)
+            reply = find_comments_replied_at(comment)[0]
+            reply_at_comment("Reply at reply", reply, self.teacher)
+            left_comment_for("Other comment", article, self.student)
+            course = find_course_with_id(course.id)
+            self.assertEqual((1, 2), (course.favored_count, course.articles_count))
+            self.assertEqual(4, find_article_with_id(article.id).comments_count)
+            delete_comment(comment, self.teacher)
+            self.assertEqual(1, find_articles_for(course)[0].comments_count)
+            self.assertEqual((1, 2), (find_all_courses()[0].favored_count, find_all_courses()[0].articles_count))
+
+    def test_models_compared_by_id(self):
+        with self.app.app_context():
+            self.create_data()
+            course = Course(1, "Course", "Description", self.teacher)
+            renamed_course = Course(1, "Renamed course", "Description", self.teacher)
+            self.assertEqual(course, renamed_course)
+            self.assertIn(renamed_course, {course})
+            self.assertNotEqual(course, Comment(1, "Course", self.teacher))
+            self.assertTrue(course.same_as(Course(1, "Course", "Description", self.teacher)))
+            self.assertFalse(course.same_as(renamed_course))
+            self.assertFalse(course.same_as(Course(1, "Course", "Description", self.student)))
+            self.assertFalse(hasattr(course, "__dict__"))
+            self.assertEqual(course, mock.ANY)
+            self.assertEqual(course.author, LocalProxy(lambda: self.teacher))
+            self.assertNotEqual(course.author, LocalProxy(lambda: self.student))
 
     def test_course_title_duplication(self):
         with self.app.app_context():
@@ -48,7 +102,7 @@ class TestCourses(BaseTestCase):
             course = courses[0]
             self.assertEqual(course_title, course.title)
             self.assertEqual(course_description, course.description)
-            self.assertEqual(self.teacher, course.author)
+            self.assertSameModels(self.teacher, course.author)
 
     def test_not_getting_not_created_by_user(self):
         with self.app.app_context():
@@ -72,10 +126,10 @@ class TestCourses(BaseTestCase):
             first_article, second_article = articles
             self.assertEqual(first_article_title, first_article.title)
             self.assertEqual(first_article_text, first_article.text)
-            self.assertEqual(self.teacher, first_article.author)
+            self.assertSameModels(self.teacher, first_article.author)
             self.assertEqual(second_article_title, second_article.title)
             self.assertEqual(second_article_text, second_article.text)
-            self.assertEqual(self.teacher, second_article.author)
+            self.assertSameModels(self.teacher, second_article.author)
 
     def test_article_editing(self):
         course_title, course_description = "First Course", "My First programming course"
@@ -93,10 +147,10 @@ class TestCourses(BaseTestCase):
             first_article, second_article = find_articles_for(course)
             self.assertEqual(second_article_new_title, second_article.title)
             self.assertEqual(second_article_new_text, second_article.text)
-            self.assertEqual(self.teacher, second_article.author)
+            self.assertSameModels(self.teacher, second_article.author)
             self.assertEqual(first_article_title, first_article.title)
             self.assertEqual(first_article_text, first_article.text)
-            self.assertEqual(self.teacher, first_article.author)
+            self.assertSameModels(self.teacher, first_article.author)
 
     def test_courses_independency(self):
         first_course_title, first_course_description = "First Course", "Programming course"
@@ -114,12 +168,12 @@ class TestCourses(BaseTestCase):
             self.assertEqual(1, len(first_course_articles))
             self.assertEqual(first_article_title, first_course_articles[0].title)
             self.assertEqual(first_article_text, first_course_articles[0].text)
-            self.assertEqual(self.teacher, first_course_articles[0].author)
+            self.assertSameModels(self.teacher, first_course_articles[0].author)
             second_course_articles = find_articles_for(second_course)
             self.assertEqual(1, len(second_course_articles), 1)
             self.assertEqual(second_article_title, second_course_articles[0].title)
             self.assertEqual(second_article_text, second_course_articles[0].text)
-            self.assertEqual(self.teacher, second_course_articles[0].author)
+            self.assertSameModels(self.teacher, second_course_articles[0].author)
 
     def test_student_cannot_create_article(self):
         course_title, course_description = "First Course", "My First programming course"
@@ -153,7 +207,98 @@ class TestCourses(BaseTestCase):
             self.assertEqual(first_course, favored_courses[0])
             self.assertEqual(second_course, favored_courses[1])
             favoring_students = find_users_favoring_course(first_course)
-            self.assertListEqual([self.student], favoring_students)
+            self.assertSameModels([self.student], favoring_students)
+
+    def test_favored_courses_listed_first(self):
+        with self.app.app_context():
+            self.create_data()
+            for title in ("First course", "Second course", "Third course"):
+                add_course(title, "Programming course", self.teacher)
+            first_course, second_course, third_course = find_courses_created_by(self.teacher)
+            add_to_favored_courses(third_course, self.student)
+            add_to_favored_courses(second_course, self.teacher)
+            self.assertListEqual([(third_course, True), (first_course, False), (second_course, False)],
+                                 find_all_courses_for(self.student))
+            self.assertListEqual([(second_course, True), (first_course, False), (third_course, False)],
+                                 find_all_courses_for(self.teacher))
+
+    def test_loading_by_ids(self):
+        with self.app.app_context():
+            self.create_data()
+            for title in ("First course", "Second course", "Third course"):
+                add_course(title, "Programming course", self.teacher)
+            first_course, second_course, third_course = find_courses_created_by(self.teacher)
+            add_article("First article", "Article about programming", first_course, self.teacher)
+            add_article("Second article", "Article about programming", third_course, self.teacher)
+            first_article = find_articles_for(first_course)[0]
+            second_article = find_articles_for(third_course)[0]
+            with self.assertMaxQueries(1):
+                courses = find_courses_with_ids([third_course.id, first_course.id, third_course.id, 1000])
+            self.assertDictEqual({first_course.id: first_course, third_course.id: third_course}, courses)
+            with self.assertMaxQueries(1):
+                articles = find_articles_with_ids([first_article.id, second_article.id])
+            self.assertSameModels({first_article.id: first_article, second_article.id: second_article}, articles)
+
+    def test_finding_article_in_course(self):
+        with self.app.app_context():
+            self.create_data()
+            add_course("First course", "Programming course", self.teacher)
+            add_course("Second course", "Programming course", self.teacher)
+            first_course, second_course = find_courses_created_by(self.teacher)
+            add_article("Article", "Article about programming", first_course, self.teacher)
+            article = find_articles_for(first_course)[0]
+            left_comment_for("Comment", article, self.student)
+            comment = find_comments_left_for(article)[0]
+            reply_at_comment("Reply", comment, self.teacher)
+            reply = find_comments_replied_at(comment)[0]
+            self.assertEqual((first_course, article, None), find_article_in_course(first_course.id, article.id))
+            self.assertEqual((first_course, article, reply),
+                             find_article_in_course(first_course.id, article.id, reply.id))
+            self.assertIsNone(find_article_in_course(second_course.id, article.id))
+            self.assertIsNone(find_article_in_course(first_course.id, article.id, 1000))
+            delete_comment(reply, self.teacher)
+            self.assertIsNone(find_article_in_course(first_course.id, article.id, reply.id))
+            client = self.app.test_client()
+            response = client.get(f"/courses/course-{second_course.id}/article-{article.id}")
+            self.assertIn("Страница не найдена", response.get_data(as_text=True))
+
+    def test_pagination(self):
+        with self.app.app_context():
+            self.create_data()
+            for i in range(5):
+                add_course(f"Course #{i}", "Programming course", self.teacher)
+            courses = find_courses_created_by(self.teacher)
+            add_to_favored_courses(courses[3], self.student)
+            self.assertEqual(courses[:2], find_all_courses(limit=2))
+            self.assertEqual(courses[2:4], find_all_courses(after_id=courses[1].id, limit=2))
+            self.assertEqual(courses[3:], find_courses_created_by(self.teacher, after_id=courses[2].id))
+            first_page = find_all_courses_for(self.student, limit=2)
+            self.assertEqual([(courses[3], True), (courses[0], False)], first_page)
+            self.assertEqual([(courses[1], False), (courses[2], False), (courses[4], False)],
+                             find_all_courses_for(self.student, after_id=first_page[-1][0].id))
+            self.assertEqual([(courses[0], False)], find_all_courses_for(self.student, after_id=courses[3].id, limit=1))
+            article = add_article("Article", "Article about programming", courses[0], self.teacher)
+            comments = [left_comment_for(f"Comment #{i}", article, self.student) for i in range(3)]
+            reply_at_comment("Reply", comments[1], self.teacher)
+            tree = find_comment_tree_for(article, after_id=comments[0].id, limit=1)
+            self.assertEqual([comments[1]], list(tree.keys()))
+            self.assertEqual(["Reply"], [reply.text for reply in tree[comments[1]]])
+            self.assertEqual(comments[2:], find_comments_left_for(article, after_id=comments[1].id))
+            self.assertEqual(comments[:1], find_comments_left_by(self.student, limit=1))
+            reply = find_comments_replied_at(comments[1])[0]
+            self.assertEqual((courses[0].id, article.id, comments[1].id), find_comment_location(reply.id))
+            self.assertEqual((courses[0].id, article.id, comments[0].id), find_comment_location(comments[0].id))
+            delete_comment(comments[2], self.teacher)
+            self.assertIsNone(find_comment_location(comments[2].id))
+            self.app.config["PAGE_SIZE"] = 2
+            client = self.app.test_client()
+            response = client.get("/courses/").get_data(as_text=True)
+            self.assertIn(f"/courses/?after={courses[1].id}", response)
+            response = client.get(f"/courses/?after={courses[3].id}").get_data(as_text=True)
+            self.assertIn("Course #4", response)
+            self.assertNotIn("?after=", response)
+            response = client.get(f"/courses/comment-{reply.id}")
+            self.assertIn(f"after={comments[1].id - 1}#comment-{reply.id}", response.location)
 
     def test_favoring_courses_removing(self):
         first_course_title, first_course_description = "First Course", "My First programming course"
@@ -204,9 +349,9 @@ class TestCourses(BaseTestCase):
             left_comment_for(second_comment_text, article, self.teacher)
             first_comment, second_comment = find_comments_left_for(article)
             self.assertEqual(first_comment_text, first_comment.text)
-            self.assertEqual(self.student, first_comment.author)
+            self.assertSameModels(self.student, first_comment.author)
             self.assertEqual(second_comment_text, second_comment.text)
-            self.assertEqual(self.teacher, second_comment.author)
+            self.assertSameModels(self.teacher, second_comment.author)
 
     def test_commenting_independency(self):
         first_course_title, first_course_description = "First course", "My first programming course"
@@ -232,11 +377,11 @@ class TestCourses(BaseTestCase):
             second_comment = find_comments_left_for(second_article)[0]
             third_comment = find_comments_left_for(third_article)[0]
             self.assertEqual(first_comment_text, first_comment.text)
-            self.assertEqual(self.student, first_comment.author)
+            self.assertSameModels(self.student, first_comment.author)
             self.assertEqual(second_comment_text, second_comment.text)
-            self.assertEqual(self.teacher, second_comment.author)
+            self.assertSameModels(self.teacher, second_comment.author)
             self.assertEqual(third_comment_text, third_comment.text)
-            self.assertEqual(self.student, third_comment.author)
+            self.assertSameModels(self.student, third_comment.author)
 
     def test_comments_replying(self):
         course_title, course_description = "First course", "My first programming course"
@@ -258,9 +403,32 @@ class TestCourses(BaseTestCase):
             self.assertEqual(1, len(find_comments_replied_at(first_comment)))
             reply_comment = find_comments_replied_at(first_comment)[0]
             self.assertEqual(reply_comment_text, reply_comment.text)
-            self.assertEqual(self.teacher, reply_comment.author)
+            self.assertSameModels(self.teacher, reply_comment.author)
             self.assertEqual(0, len(find_comments_replied_at(second_comment)))
 
+    def test_comment_tree(self):
+        course_title, course_description = "First course", "My first programming course"
+        article_title, article_text = "Article #1", "Article about programming"
+        with self.app.app_context():
+            self.create_data()
+            add_course(course_title, course_description, self.teacher)
+            course = find_courses_created_by(self.teacher)[0]
+            add_article(article_title, article_text, course, self.teacher)
+            article = find_articles_for(course)[0]
+            left_comment_for("First comment", article, self.student)
+            left_comment_for("Second comment", article, self.student)
+            first_comment, second_comment = find_comments_left_for(article)
+            reply_at_comment("Reply", first_comment, self.teacher)
+            reply = find_comments_replied_at(first_comment)[0]
+            reply_at_comment("Reply at reply", reply, self.teacher)
+            reply_at_comment("Deleted reply", second_comment, self.teacher)
+            delete_comment(find_comments_replied_at(second_comment)[0], self.teacher)
+            tree = find_comment_tree_for(article)
+            self.assertEqual([first_comment, second_comment], list(tree.keys()))
+            self.assertEqual(["Reply", "Reply at reply"], [c.text for c in tree[first_comment]])
+            self.assertSameModels(self.teacher, tree[first_comment][1].author)
+            self.assertEqual([], tree[second_comment])
+
     def test_comments_deletion(self):
         course_title, course_description = "First course", "My first programming course"
         article_title, article_text = "Article #1", "Article about programming"
@@ -279,7 +447,7 @@ class TestCourses(BaseTestCase):
             self.assertEqual(1, len(find_comments_left_for(article)))
             remaining_comment = find_comments_left_for(article)[0]
             self.assertEqual(second_comment_text, remaining_comment.text)
-            self.assertEqual(self.teacher, remaining_comment.author)
+            self.assertSameModels(self.teacher, remaining_comment.author)
 
     def test_comments_replies_deletion(self):
         course_title, course_description = "First course", "My first programming course"
@@ -298,7 +466,7 @@ class TestCourses(BaseTestCase):
             self.assertEqual(1, len(find_comments_left_for(article)))
             self.assertEqual(2, len(find_comments_left_by(self.teacher)))
             comment_for_deletion = find_comments_left_for(article)[0]
-            delete_comment(comment_for_deletion, self.teacher)
+            self.assertEqual(3, delete_comment(comment_for_deletion, self.teacher))
             self.assertEqual(0, len(find_comments_left_for(article)))
             self.assertEqual(0, len(find_comments_left_by(self.teacher)))
 
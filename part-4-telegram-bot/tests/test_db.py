@@ -0,0 +1,506 @@
+import os.path
+import sqlite3
+import tempfile
+import threading
+import time
+
+from tests import BaseTestCase
+from webapp import create_app
+from webapp.db import get_connection, get_pool, get_read_connection, close_pools, transaction, get_lock_stats
+from webapp.db.accounting import register_user, find_user_with_email, find_users_with_ids, \
+    invalidate_user
+from webapp.db.backup import backup_database, backup_to_directory, restore_database, verify_backup, \
+    find_backups, CorruptedBackup
+from webapp.db.counters import find_counter_drift, recompute_counters
+from webapp.db.courses import add_course, find_all_courses, CourseAlreadyExists, add_to_favored_courses, \
+    add_article, left_comment_for
+from webapp.db.instrumentation import get_query_stats
+from webapp.db.loader import get_loader
+from webapp.db.migrations import migrate, get_schema_version, find_migrations
+from webapp.db.notifications import add_notification, get_pending_notifications, connect_telegram, \
+    find_telegram_for
+from webapp.db.pool import ConnectionPool, PoolExhausted
+from webapp.db.pragmas import resolve_pragmas
+
+
+class ConnectionPoolTests(BaseTestCase):
+
+    def test_connection_reused_between_app_contexts(self):
+        with self.app.app_context():
+            self.create_data()
+            first_connection = get_connection()
+        with self.app.app_context():
+            self.assertIs(first_connection, get_connection())
+            tables = get_connection().execute("SELECT name FROM sqlite_master WHERE type = 'table';").fetchall()
+            self.assertIn("users", [t["name"] for t in tables])
+            self.assertEqual(1, get_pool().stats()["opened"])
+
+    def test_pool_size_is_bounded(self):
+        pool = ConnectionPool(lambda: sqlite3.connect(":memory:"), size=2, timeout=0.05)
+        first, second = pool.checkout(), pool.checkout()
+        self.assertRaises(PoolExhausted, pool.checkout)
+        stats = pool.stats()
+        self.assertEqual(2, stats["opened"])
+        self.assertEqual(1, stats["exhausted"])
+        self.assertEqual(1, stats["timeouts"])
+        pool.checkin(first)
+        self.assertIs(first, pool.checkout())
+        pool.checkin(first)
+        pool.checkin(second)
+        pool.close()
+
+    def test_waiting_for_returned_connection(self):
+        pool = ConnectionPool(lambda: sqlite3.connect(":memory:", check_same_thread=False),
+                              size=1, timeout=5)
+        connection = pool.checkout()
+        timer = threading.Timer(0.05, pool.checkin, (connection,))
+        timer.start()
+        self.assertIs(connection, pool.checkout())
+        timer.join()
+        self.assertGreater(pool.stats()["wait-max"], 0)
+        connection.close()
+
+    def test_uncommitted_changes_rolled_back_on_checkin(self):
+        pool = ConnectionPool(lambda: sqlite3.connect(":memory:"), size=1)
+        connection = pool.checkout()
+        connection.execute("CREATE TABLE t (x INTEGER);")
+        connection.commit()
+        connection.execute("INSERT INTO t VALUES (1);")
+        pool.checkin(connection)
+        connection = pool.checkout()
+        self.assertEqual(0, connection.execute("SELECT COUNT(*) FROM t;").fetchone()[0])
+        connection.close()
+
+
+class PragmasTests(BaseTestCase):
+
+    def test_profile_applied_to_connection(self):
+        app = create_app(config={
+            "DATABASE": ":memory:",
+            "TEST": True,
+            "SQLITE_PROFILE": "fast",
+            "SQLITE_PRAGMAS": {"cache_size": -1000}
+        })
+        self.addCleanup(close_pools, app)
+        with app.app_context():
+            connection = get_connection()
+            self.assertEqual(0, connection.execute("PRAGMA synchronous;").fetchone()[0])
+            self.assertEqual(-1000, connection.execute("PRAGMA cache_size;").fetchone()[0])
+            self.assertEqual(2, connection.execute("PRAGMA temp_store;").fetchone()[0])
+            self.assertEqual(5000, connection.execute("PRAGMA busy_timeout;").fetchone()[0])
+
+    def test_unknown_profile(self):
+        self.assertRaises(ValueError, resolve_pragmas, "fastest")
+
+
+class ReadOnlyRoutingTests(BaseTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.app = create_app(config={
+            "DATABASE": os.path.join(self.directory.name, "test.db"),
+            "TEST": True
+        })
+
+    def tearDown(self):
+        super().tearDown()
+        self.directory.cleanup()
+
+    def test_reads_use_read_only_connection(self):
+        with self.app.app_context():
+            self.create_data()
+            register_user("ivan", "ivan@mail.com", "qwerty123")
+            self.assertIsNotNone(find_user_with_email("ivan@mail.com"))
+            reader = get_read_connection()
+            self.assertIsNot(get_connection(), reader)
+            self.assertRaises(sqlite3.OperationalError, reader.execute, "DELETE FROM users;")
+
+    def test_reads_inside_write_transaction_use_writer(self):
+        with self.app.app_context():
+            self.create_data()
+            writer = get_connection()
+            writer.execute("INSERT INTO users (login, email, password_hash) VALUES ('a', 'b', 'c');")
+            self.assertIs(writer, get_read_connection())
+            self.assertIsNotNone(find_user_with_email("b"))
+            writer.commit()
+            self.assertIsNot(writer, get_read_connection())
+
+
+class InstrumentationTests(BaseTestCase):
+
+    def test_queries_counted(self):
+        with self.app.app_context():
+            self.create_data()
+            queries_before = get_query_stats().count
+            find_user_with_email("ivan@mail.com")
+            find_user_with_email("ivanov@mail.com")
+            stats = get_query_stats()
+            self.assertEqual(queries_before + 2, stats.count)
+            self.assertGreaterEqual(stats.total, stats.slowest)
+
+    def test_server_timing_header(self):
+        with self.app.app_context():
+            self.create_data()
+        response = self.app.test_client().get("/courses/")
+        self.assertEqual(200, response.status_code)
+        self.assertRegex(response.headers["Server-Timing"], r'^db;dur=[\d.]+;desc="1 queries"')
+
+    def test_slow_query_logged_with_caller(self):
+        with self.app.app_context():
+            self.create_data()
+            self.app.config["SQL_SLOW_QUERY_MS"] = 0
+            with self.assertLogs(self.app.logger, "WARNING") as logs:
+                find_user_with_email("ivan@mail.com")
+        self.assertIn("webapp.db.accounting.find_user_with_email", logs.output[0])
+        self.assertIn("SELECT id, login, email, password_hash FROM users WHERE email = ?;", logs.output[0])
+
+
+class MigrationsTests(BaseTestCase):
+
+    def test_init_db_applies_migrations(self):
+        with self.app.app_context():
+            self.create_data()
+            self.assertEqual(find_migrations()[-1][0], get_schema_version())
+            self.assertListEqual([], migrate())
+            indexes = {r["name"] for r in get_connection().execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index';")}
+            self.assertIn("comments_parent_article_id_idx", indexes)
+            self.assertIn("courses_favored_by_users_user_id_course_id_idx", indexes)
+
+    def test_migrating_existing_database(self):
+        with self.app.app_context():
+            connection = get_connection()
+            with self.app.open_resource("db-schema.sql") as f:
+                connection.executescript(f.read().decode("utf-8"))
+            connection.executescript("""
+                INSERT INTO courses_favored_by_users (course_id, user_id) VALUES (1, 1);
+                INSERT INTO courses_favored_by_users (course_id, user_id) VALUES (1, 1);
+                INSERT INTO courses_favored_by_users (course_id, user_id) VALUES (2, 1);
+            """)
+            self.assertEqual(0, get_schema_version())
+            result = self.app.test_cli_runner().invoke(args=["migrate"])
+            self.assertIn("Applied migration 0001_add_secondary_indexes", result.output)
+            self.assertEqual(2, connection.execute(
+                "SELECT COUNT(*) FROM courses_favored_by_users;").fetchone()[0])
+
+    def test_comments_root_article_backfilled(self):
+        with self.app.app_context():
+            connection = get_connection()
+            with self.app.open_resource("db-schema.sql") as f:
+                connection.executescript(f.read().decode("utf-8"))
+            connection.executescript("""
+                INSERT INTO comments (text, parent_article_id, author_id) VALUES ('Comment', 7, 1);
+                INSERT INTO comments (text, parent_comment_id, author_id) VALUES ('Reply', 1, 1);
+                INSERT INTO comments (text, parent_comment_id, author_id) VALUES ('Reply at reply', 2, 1);
+            """)
+            migrate()
+            self.assertEqual([7, 7, 7], [r[0] for r in connection.execute(
+                "SELECT root_article_id FROM comments ORDER BY id;")])
+
+
+class CountersTests(BaseTestCase):
+
+    def create_data(self):
+        super().create_data()
+        register_user("ivan", "ivan@mail.com", "qwerty123")
+        self.user = find_user_with_email("ivan@mail.com")
+        self.course = add_course("Course", "Description", self.user)
+        add_to_favored_courses(self.course, self.user)
+        left_comment_for("Comment", add_article("Article", "Text", self.course, self.user), self.user)
+
+    def test_counters_backfilled(self):
+        with self.app.app_context():
+            connection = get_connection()
+            with self.app.open_resource("db-schema.sql") as f:
+                connection.executescript(f.read().decode("utf-8"))
+            connection.executescript("""
+                INSERT INTO courses (title, description, author_id) VALUES ('Course', 'Description', 1);
+                INSERT INTO courses_favored_by_users (course_id, user_id) VALUES (1, 1);
+                INSERT INTO articles (title, text, course_id, author_id) VALUES ('Article', 'Text', 1, 1);
+                INSERT INTO comments (text, parent_article_id, author_id) VALUES ('Comment', 1, 1);
+                INSERT INTO comments (text, parent_comment_id, author_id) VALUES ('Reply', 1, 1);
+                INSERT INTO comments (text, parent_article_id, author_id, deleted) VALUES ('Deleted', 1, 1, 1);
+            """)
+            migrate()
+            self.assertEqual((1, 1), tuple(connection.execute(
+                "SELECT favored_count, articles_count FROM courses;").fetchone()))
+            self.assertEqual(2, connection.execute("SELECT comments_count FROM articles;").fetchone()[0])
+            self.assertListEqual([], find_counter_drift())
+
+    def test_drift_found_and_fixed(self):
+        with self.app.app_context():
+            self.create_data()
+            self.assertListEqual([], find_counter_drift())
+            get_connection().executescript("""
+                UPDATE courses SET favored_count = 5;
+                UPDATE articles SET comments_count = 0;
+            """)
+            self.assertListEqual([("courses", "favored_count", self.course.id, 5, 1),
+                                  ("articles", "comments_count", 1, 0, 1)], find_counter_drift())
+            runner = self.app.test_cli_runner()
+            result = runner.invoke(args=["verify-counters"])
+            self.assertNotEqual(0, result.exit_code)
+            self.assertIn("courses.favored_count", result.output)
+            self.assertIn("Fixed 2 counters", runner.invoke(args=["recompute-counters"]).output)
+            self.assertEqual(0, recompute_counters())
+            self.assertEqual(0, runner.invoke(args=["verify-counters"]).exit_code)
+
+
+class GroupCommitTests(BaseTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.app = create_app(config={
+            "DATABASE": os.path.join(self.directory.name, "test.db"),
+            "TEST": True,
+            "DATABASE_GROUP_COMMIT": True,
+            "DATABASE_GROUP_COMMIT_WINDOW_MS": 50
+        })
+        with self.app.app_context():
+            self.create_data()
+            register_user("ivan", "ivan@mail.com", "qwerty123")
+            self.user = find_user_with_email("ivan@mail.com")
+
+    def tearDown(self):
+        super().tearDown()
+        self.directory.cleanup()
+
+    def test_concurrent_writes_share_commits(self):
+        writes_count = 20
+
+        def notify(i):
+            with self.app.app_context():
+                add_notification(self.user, f"Notification #{i}")
+
+        threads = [threading.Thread(target=notify, args=(i,)) for i in range(writes_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        with self.app.app_context():
+            self.assertEqual(writes_count, len(get_pending_notifications()))
+        stats = self.app.extensions["db_writer"].stats()
+        self.assertEqual(writes_count + 1, stats["operations"])
+        self.assertLess(stats["commits"], writes_count)
+
+    def test_failed_write_does_not_affect_batch(self):
+        with self.app.app_context():
+            add_course("Course", "Description", self.user)
+            self.assertRaises(CourseAlreadyExists, add_course, "Course", "Other description", self.user)
+            add_course("Other course", "Description", self.user)
+            self.assertEqual(["Course", "Other course"], [c.title for c in find_all_courses()])
+
+    def test_views_write_for_current_user(self):
+        # поток записи выполняет операции вне контекста запроса, где current_user недоступен
+        self.app.config["WTF_CSRF_ENABLED"] = False
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session["_user_id"] = str(self.user.id)
+            session["_fresh"] = True
+        response = client.post("/courses/new-course", data={"title": "Course", "description": "Description"})
+        self.assertEqual(200, response.status_code)
+        with self.app.app_context():
+            course = find_all_courses()[0]
+        self.assertEqual(302, client.post(f"/courses/course-{course.id}/favour").status_code)
+        with self.app.app_context():
+            self.assertEqual(1, find_all_courses()[0].favored_count)
+        self.assertEqual(302, client.post(f"/courses/course-{course.id}/unfavor").status_code)
+        with self.app.app_context():
+            self.assertEqual(0, find_all_courses()[0].favored_count)
+            connect_telegram(self.user, 1001, "ivan")
+        self.assertEqual(302, client.get("/profile/disconnect-telegram").status_code)
+        with self.app.app_context():
+            self.assertIsNone(find_telegram_for(self.user))
+
+
+class TransactionTests(BaseTestCase):
+
+    def create_data(self):
+        super().create_data()
+        register_user("ivan", "ivan@mail.com", "qwerty123")
+        self.user = find_user_with_email("ivan@mail.com")
+
+    def test_changes_committed_on_exit(self):
+        with self.app.app_context():
+            self.create_data()
+            with transaction():
+                add_course("First course", "Description", self.user)
+                add_course("Second course", "Description", self.user)
+                self.assertTrue(get_connection().in_transaction)
+                self.assertEqual(2, len(find_all_courses()))
+            self.assertFalse(get_connection().in_transaction)
+            self.assertEqual(2, len(find_all_courses()))
+
+    def test_changes_rolled_back_on_exception(self):
+        with self.app.app_context():
+            self.create_data()
+            with self.assertRaises(RuntimeError):
+                with transaction():
+                    add_course("First course", "Description", self.user)
+                    raise RuntimeError()
+            self.assertEqual(0, len(find_all_courses()))
+
+    def test_caught_exception_rolls_back_only_failed_operation(self):
+        with self.app.app_context():
+            self.create_data()
+            with transaction():
+                add_course("First course", "Description", self.user)
+                self.assertRaises(CourseAlreadyExists, add_course, "First course", "Description", self.user)
+                with self.assertRaises(RuntimeError):
+                    with transaction():
+                        add_course("Second course", "Description", self.user)
+                        raise RuntimeError()
+                add_course("Third course", "Description", self.user)
+            self.assertEqual(["First course", "Third course"], [c.title for c in find_all_courses()])
+
+
+class BusyRetryTests(BaseTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.database = os.path.join(self.directory.name, "test.db")
+        self.app = create_app(config={
+            "DATABASE": self.database,
+            "TEST": True,
+            "SQLITE_PRAGMAS": {"busy_timeout": 10},
+            "DATABASE_BUSY_RETRIES": 2,
+            "DATABASE_BUSY_RETRY_DELAY_MS": 10
+        })
+        with self.app.app_context():
+            self.create_data()
+            register_user("ivan", "ivan@mail.com", "qwerty123")
+            self.user = find_user_with_email("ivan@mail.com")
+        self.blocker = sqlite3.connect(self.database, isolation_level=None, check_same_thread=False)
+        self.blocker.execute("BEGIN IMMEDIATE;")
+
+    def tearDown(self):
+        self.blocker.close()
+        super().tearDown()
+        self.directory.cleanup()
+
+    def test_write_fails_after_retries(self):
+        with self.app.app_context():
+            with self.assertRaises(sqlite3.OperationalError):
+                add_course("Course", "Description", self.user)
+            stats = get_lock_stats()
+        self.assertEqual(3, stats["busy"])
+        self.assertEqual(2, stats["retries"])
+        self.assertEqual(1, stats["failures"])
+
+    def test_contention_logged(self):
+        self.app.config["DATABASE_STATS_LOG_INTERVAL"] = 0.001
+        client = self.app.test_client()
+        time.sleep(0.002)
+        with self.assertLogs(self.app.logger, "INFO") as logs:
+            client.get("/courses/")
+        records = [r for r in logs.records if r.getMessage().startswith("Database stats")]
+        self.assertEqual(["INFO"], [r.levelname for r in records])
+        self.assertIn('"failures": 0', records[0].getMessage())
+        with self.app.app_context():
+            self.assertRaises(sqlite3.OperationalError, add_course, "Course", "Description", self.user)
+        time.sleep(0.002)
+        with self.assertLogs(self.app.logger, "INFO") as logs:
+            client.get("/courses/")
+        records = [r for r in logs.records if r.getMessage().startswith("Database stats")]
+        self.assertEqual(["WARNING"], [r.levelname for r in records])
+        self.assertIn('"failures": 1', records[0].getMessage())
+
+    def test_write_succeeds_after_lock_released(self):
+        self.app.config["DATABASE_BUSY_RETRIES"] = 10
+        self.app.config["DATABASE_BUSY_RETRY_DELAY_MS"] = 50
+        timer = threading.Timer(0.1, self.blocker.rollback)
+        timer.start()
+        with self.app.app_context():
+            add_course("Course", "Description", self.user)
+            self.assertEqual(["Course"], [c.title for c in find_all_courses()])
+            stats = get_lock_stats()
+        timer.join()
+        self.assertGreater(stats["retries"], 0)
+        self.assertEqual(0, stats["failures"])
+        self.assertGreater(stats["waits"], 0)
+
+class BackupTests(BaseTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.app = create_app(config={
+            "DATABASE": os.path.join(self.directory.name, "test.db"),
+            "TEST": True
+        })
+        with self.app.app_context():
+            self.create_data()
+            register_user("ivan", "ivan@mail.com", "qwerty123")
+            self.user = find_user_with_email("ivan@mail.com")
+            add_course("Course", "Description", self.user)
+
+    def tearDown(self):
+        super().tearDown()
+        self.directory.cleanup()
+
+    def test_backup_and_restore(self):
+        path = os.path.join(self.directory.name, "backup.db")
+        with self.app.app_context():
+            result = backup_database(path, pages=1, sleep=0)
+        self.assertGreater(result["pages"], 1)
+        verify_backup(path)
+        with self.app.app_context():
+            add_course("Other course", "Description", self.user)
+        with self.app.app_context():
+            restore_database(path)
+        with self.app.app_context():
+            self.assertEqual(["Course"], [c.title for c in find_all_courses()])
+
+    def test_rotating_backups(self):
+        path = os.path.join(self.directory.name, "backups")
+        runner = self.app.test_cli_runner()
+        for _ in range(3):
+            result = runner.invoke(args=["backup-db", path, "--keep", "2"])
+            self.assertIn("Backed up", result.output)
+        self.assertEqual(2, len(find_backups(path)))
+
+    def test_pause_between_steps(self):
+        path = os.path.join(self.directory.name, "backup.db")
+        with self.app.app_context():
+            result = backup_database(path, pages=1, sleep=0.02)
+        self.assertGreaterEqual(result["seconds"], (result["pages"] - 1) * 0.02)
+
+    def test_at_least_one_backup_kept(self):
+        path = os.path.join(self.directory.name, "backups")
+        result = self.app.test_cli_runner().invoke(args=["backup-db", path, "--keep", "0"])
+        self.assertNotEqual(0, result.exit_code)
+        self.assertFalse(os.path.exists(path))
+        with self.app.app_context():
+            self.assertRaises(ValueError, backup_to_directory, path, 0)
+
+    def test_corrupted_backup_not_restored(self):
+        path = os.path.join(self.directory.name, "backup.db")
+        with open(path, "wb") as f:
+            f.write(b"not a database" * 1000)
+        with self.app.app_context():
+            self.assertRaises(CorruptedBackup, restore_database, path)
+            self.assertEqual(["Course"], [c.title for c in find_all_courses()])
+
+
+class DataLoaderTests(BaseTestCase):
+
+    def create_data(self):
+        super().create_data()
+        for login in ("ivan", "petr", "anna"):
+            register_user(login, f"{login}@mail.com", "qwerty123")
+        self.users = [find_user_with_email(f"{login}@mail.com") for login in ("ivan", "petr", "anna")]
+
+    def test_deferred_loads_batched(self):
+        with self.app.app_context():
+            self.create_data()
+        with self.app.app_context():
+            loader = get_loader(find_users_with_ids)
+            with self.assertMaxQueries(1) as statements:
+                deferred = [loader.load(user.id) for user in self.users] + [loader.load(1000)]
+                self.assertEqual(0, len(statements))
+                self.assertSameModels(self.users, [user() for user in deferred[:-1]])
+                self.assertIsNone(deferred[-1]())
+                self.assertEqual(self.users[0], loader.get(self.users[0].id))
+            self.assertIs(loader, get_loader(find_users_with_ids))
+            invalidate_user(self.users[0].id)
+            with self.assertMaxQueries(1):
+                self.assertEqual(self.users[0], loader.get(self.users[0].id))
@@ -3,7 +3,9 @@ from webapp.db.accounting import register_user, \
     find_user_with_email
 from webapp.db.notifications import UserAlreadyConnectedToTelegram, \
     TelegramAlreadyConnectedToAnotherUser, connect_telegram, disconnect_telegram, \
-    find_telegram_for, get_pending_notifications, add_notification, mark_delivered
+    find_telegram_for, get_pending_notifications, add_notification, mark_delivered, \
+    get_pending_deliveries, notify_course_subscribers
+from webapp.db.courses import add_course, find_courses_created_by, add_to_favored_courses
 
 
 class NotificationTests(BaseTestCase):
@@ -90,13 +92,47 @@ class NotificationTests(BaseTestCase):
             first_notification, second_notification, third_notification = get_pending_notifications()
             self.assertEqual(first_notification_text, first_notification.text)
             self.assertEqual(first_notification_link, first_notification.link)
-            self.assertEqual(self.first_user, first_notification.user)
+            self.assertSameModels(self.first_user, first_notification.user)
             self.assertEqual(second_notification_text, second_notification.text)
             self.assertIsNone(second_notification.link)
-            self.assertEqual(self.first_user, second_notification.user)
+            self.assertSameModels(self.first_user, second_notification.user)
             self.assertEqual(third_notification_text, third_notification.text)
             self.assertEqual(third_notification_link, third_notification.link)
-            self.assertEqual(self.second_user, third_notification.user)
+            self.assertSameModels(self.second_user, third_notification.user)
+
+    def test_pending_deliveries_only_for_connected_users(self):
+        account_user_id, account_username = 123456789, "Ivan"
+        with self.app.app_context():
+            self.create_data()
+            connect_telegram(self.first_user, account_user_id, account_username)
+            add_notification(self.first_user, "First notification", "www.google.com")
+            add_notification(self.second_user, "Second notification")
+            add_notification(self.first_user, "Third notification")
+            deliveries = get_pending_deliveries()
+            self.assertEqual(["First notification", "Third notification"],
+                             [notification.text for notification, _ in deliveries])
+            notification, account = deliveries[0]
+            self.assertSameModels(self.first_user, notification.user)
+            self.assertSameModels(find_telegram_for(self.first_user), account)
+            self.assertSameModels(self.first_user, account.user)
+            mark_delivered(notification)
+            self.assertEqual(1, len(get_pending_deliveries()))
+
+    def test_course_subscribers_notification(self):
+        with self.app.app_context():
+            self.create_data()
+            register_user("teacher", "teacher@mail.com", "qwerty123")
+            teacher = find_user_with_email("teacher@mail.com")
+            add_course("Course", "Description", teacher)
+            course = find_courses_created_by(teacher)[0]
+            add_to_favored_courses(course, self.first_user)
+            add_to_favored_courses(course, self.second_user)
+            connect_telegram(self.first_user, 123456789, "Ivan")
+            self.assertEqual(1, notify_course_subscribers(course, "New article", "www.google.com"))
+            notification, = get_pending_notifications()
+            self.assertEqual("New article", notification.text)
+            self.assertEqual("www.google.com", notification.link)
+            self.assertSameModels(self.first_user, notification.user)
 
     def test_notifications_text_duplication(self):
         first_notification_text, first_notification_link = "Notification!", "www.google.com"
@@ -111,13 +147,13 @@ class NotificationTests(BaseTestCase):
             first_notification, second_notification, third_notification = get_pending_notifications()
             self.assertEqual(first_notification_text, first_notification.text)
             self.assertEqual(first_notification_link, first_notification.link)
-            self.assertEqual(self.first_user, first_notification.user)
+            self.assertSameModels(self.first_user, first_notification.user)
             self.assertEqual(second_notification_text, second_notification.text)
             self.assertIsNone(second_notification.link)
-            self.assertEqual(self.first_user, second_notification.user)
+            self.assertSameModels(self.first_user, second_notification.user)
             self.assertEqual(third_notification_text, third_notification.text)
             self.assertEqual(third_notification_link, third_notification.link)
-            self.assertEqual(self.first_user, third_notification.user)
+            self.assertSameModels(self.first_user, third_notification.user)
             self.assertNotEquals(first_notification, second_notification)
             self.assertNotEqual(first_notification, third_notification)
             self.assertNotEquals(second_notification, third_notification)
@@ -137,14 +173,14 @@ class NotificationTests(BaseTestCase):
             first_notification, third_notification = get_pending_notifications()
             self.assertEqual(first_notification_text, first_notification.text)
             self.assertEqual(first_notification_link, first_notification.link)
-            self.assertEqual(self.first_user, first_notification.user)
+            self.assertSameModels(self.first_user, first_notification.user)
             self.assertEqual(third_notification_text, third_notification.text)
             self.assertEqual(third_notification_link, third_notification.link)
-            self.assertEqual(self.second_user, third_notification.user)
+            self.assertSameModels(self.second_user, third_notification.user)
             mark_delivered(third_notification)
             first_notification, *_ = get_pending_notifications()
             self.assertEqual(first_notification_text, first_notification.text)
             self.assertEqual(first_notification_link, first_notification.link)
-            self.assertEqual(self.first_user, first_notification.user)
+            self.assertSameModels(self.first_user, first_notification.user)
             mark_delivered(first_notification)
             self.assertEqual(0, len(get_pending_notifications()))
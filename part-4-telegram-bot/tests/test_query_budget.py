@@ -0,0 +1,212 @@
+import io
+import os.path
+from unittest.mock import patch
+
+from tests import BaseTestCase
+from webapp.db.accounting import register_user, find_user_with_email
+from webapp.db.courses import add_course, find_courses_created_by, add_article, \
+    find_articles_for, left_comment_for, find_comments_left_for, reply_at_comment, \
+    add_to_favored_courses
+from webapp.db.notifications import connect_telegram, add_notification
+
+SECRET_API_KEY = "test-secret-key"
+
+
+class QueryBudgetTests(BaseTestCase):
+    """
+    Количество запросов, выполняемых каждым обработчиком, не должно зависеть от объёма данных
+    """
+
+    DATASET_SIZE = 10
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            self.create_data()
+
+    def create_data(self):
+        super().create_data()
+        register_user("teacher", "teacher@mail.com", "qwerty123")
+        register_user("student", "student@mail.com", "qwerty123")
+        self.teacher = find_user_with_email("teacher@mail.com")
+        self.student = find_user_with_email("student@mail.com")
+        connect_telegram(self.teacher, 1001, "teacher")
+        connect_telegram(self.student, 1002, "student")
+        for i in range(self.DATASET_SIZE):
+            add_course(f"Course #{i}", "Programming course", self.teacher)
+        courses = find_courses_created_by(self.teacher)
+        for course in courses:
+            add_to_favored_courses(course, self.student)
+        self.course = courses[0]
+        for i in range(self.DATASET_SIZE):
+            add_article(f"Article #{i}", "Article about programming", self.course, self.teacher)
+        self.article = find_articles_for(self.course)[0]
+        for i in range(self.DATASET_SIZE):
+            left_comment_for(f"Comment #{i}", self.article, self.student)
+        for comment in find_comments_left_for(self.article):
+            reply_at_comment("Reply", comment, self.teacher)
+        self.comment = find_comments_left_for(self.article)[0]
+        for i in range(self.DATASET_SIZE):
+            add_notification(self.student, f"Notification #{i}", "/courses/")
+        self.images_path = os.path.join(self.app.root_path, "tests", "resources")
+
+    def login(self, user):
+        with self.client.session_transaction() as session:
+            session["_user_id"] = str(user.id)
+            session["_fresh"] = True
+
+    def article_url(self, suffix=""):
+        return f"/courses/course-{self.course.id}/article-{self.article.id}{suffix}"
+
+    def test_show_all_courses(self):
+        with self.assertMaxQueries(1):
+            self.assertEqual(200, self.client.get("/courses/").status_code)
+
+    def test_show_all_courses_authenticated(self):
+        self.login(self.student)
+        with self.assertMaxQueries(2):
+            self.assertEqual(200, self.client.get("/courses/").status_code)
+
+    def test_add_to_favored_courses(self):
+        self.login(self.student)
+        with self.assertMaxQueries(3):
+            self.assertEqual(302, self.client.post(f"/courses/course-{self.course.id}/favour").status_code)
+
+    def test_remove_from_favored_courses(self):
+        self.login(self.student)
+        with self.assertMaxQueries(3):
+            self.assertEqual(302, self.client.post(f"/courses/course-{self.course.id}/unfavor").status_code)
+
+    def test_create_course_form(self):
+        self.login(self.teacher)
+        with self.assertMaxQueries(1):
+            self.assertEqual(200, self.client.get("/courses/new-course").status_code)
+
+    def test_create_course(self):
+        self.app.config["WTF_CSRF_ENABLED"] = False
+        self.login(self.teacher)
+        with self.assertMaxQueries(3):
+            response = self.client.post("/courses/new-course",
+                                        data={"title": "New course", "description": "Description"})
+            self.assertEqual(200, response.status_code)
+
+    def test_show_course(self):
+        with self.assertMaxQueries(2):
+            self.assertEqual(200, self.client.get(f"/courses/course-{self.course.id}").status_code)
+
+    def test_create_article(self):
+        self.login(self.teacher)
+        with self.assertMaxQueries(4):
+            response = self.client.get(f"/courses/course-{self.course.id}/new-article")
+            self.assertEqual(302, response.status_code)
+
+    def test_edit_article_form(self):
+        self.login(self.teacher)
+        with self.assertMaxQueries(2):
+            self.assertEqual(200, self.client.get(self.article_url("/edit")).status_code)
+
+    def test_edit_article(self):
+        self.app.config["WTF_CSRF_ENABLED"] = False
+        self.login(self.teacher)
+        with open(os.path.join(self.images_path, "image-2.png"), "rb") as f:
+            image = f.read()
+        with self.assertMaxQueries(4):
+            response = self.client.post(self.article_url("/edit"), data={
+                "title": "New title",
+                "text": "New text",
+                "images": [(io.BytesIO(image), "image.png", "image/png")]
+            })
+            self.assertEqual(302, response.status_code)
+
+    def test_show_article(self):
+        with self.assertMaxQueries(3):
+            self.assertEqual(200, self.client.get(self.article_url()).status_code)
+
+    def test_create_comment(self):
+        self.app.config["WTF_CSRF_ENABLED"] = False
+        self.login(self.student)
+        with self.assertMaxQueries(5):
+            response = self.client.post(self.article_url("/new-comment"), data={"text": "Comment"})
+            self.assertEqual(302, response.status_code)
+
+    def test_reply_to_comment(self):
+        self.app.config["WTF_CSRF_ENABLED"] = False
+        self.login(self.teacher)
+        with self.assertMaxQueries(6):
+            response = self.client.post(self.article_url(f"/comment-{self.comment.id}/reply"),
+                                        data={"text": "Reply"})
+            self.assertEqual(302, response.status_code)
+
+    def test_delete_comment(self):
+        self.login(self.teacher)
+        with self.assertMaxQueries(4):
+            response = self.client.post(self.article_url(f"/comment-{self.comment.id}/delete"))
+            self.assertEqual(302, response.status_code)
+
+    def test_link_to_comment(self):
+        with self.assertMaxQueries(1):
+            self.assertEqual(302, self.client.get(f"/courses/comment-{self.comment.id}").status_code)
+
+    def test_login_form(self):
+        with self.assertMaxQueries(0):
+            self.assertEqual(200, self.client.get("/profile/login").status_code)
+
+    def test_login(self):
+        self.app.config["WTF_CSRF_ENABLED"] = False
+        with self.assertMaxQueries(1):
+            response = self.client.post("/profile/login",
+                                        data={"email": "student@mail.com", "password": "qwerty123"})
+            self.assertEqual(302, response.status_code)
+
+    def test_register(self):
+        self.app.config["WTF_CSRF_ENABLED"] = False
+        with self.assertMaxQueries(1):
+            response = self.client.post("/profile/register", data={
+                "login": "newbie", "email": "newbie@mail.com",
+                "password": "qwerty123", "password_repeat": "qwerty123"
+            })
+            self.assertEqual(302, response.status_code)
+
+    def test_logout(self):
+        self.login(self.student)
+        with self.assertMaxQueries(1):
+            self.assertEqual(302, self.client.get("/profile/logout").status_code)
+
+    def test_profile(self):
+        self.login(self.student)
+        with self.assertMaxQueries(2):
+            self.assertEqual(200, self.client.get("/profile/").status_code)
+
+    def test_disconnect_telegram(self):
+        self.login(self.student)
+        with self.assertMaxQueries(3):
+            self.assertEqual(302, self.client.get("/profile/disconnect-telegram").status_code)
+
+    @patch("webapp.notifications_api.SECRET_API_KEY", SECRET_API_KEY)
+    def test_get_account_status(self):
+        with self.assertMaxQueries(2):
+            response = self.client.get("/api/telegram-account/1002", query_string={"secret-key": SECRET_API_KEY})
+            self.assertTrue(response.json["connected"])
+
+    @patch("webapp.notifications_api.SECRET_API_KEY", SECRET_API_KEY)
+    def test_connect_account(self):
+        with self.assertMaxQueries(2):
+            response = self.client.post("/api/telegram-account/1003", query_string={"secret-key": SECRET_API_KEY},
+                                        json={"user-email": "teacher@mail.com",
+                                              "account-username": "another",
+                                              "verification-code": self.teacher.get_verification_code()})
+            self.assertEqual("user-already-connected", response.json["message"])
+
+    @patch("webapp.notifications_api.SECRET_API_KEY", SECRET_API_KEY)
+    def test_get_pending_notifications(self):
+        with self.assertMaxQueries(1):
+            response = self.client.get("/api/pending-notifications", query_string={"secret-key": SECRET_API_KEY})
+            self.assertEqual(self.DATASET_SIZE, len(response.json["notifications"]))
+
+    @patch("webapp.notifications_api.SECRET_API_KEY", SECRET_API_KEY)
+    def test_mark_notification_delivered(self):
+        with self.assertMaxQueries(3):
+            response = self.client.post("/api/pending-notifications/1/delivered",
+                                        query_string={"secret-key": SECRET_API_KEY})
+            self.assertTrue(response.json["success"])
@@ -15,6 +15,21 @@ def create_app(config: dict = None):
     app = Flask("electro-guidebook")
     app.config.from_mapping(
         DATABASE=os.path.join(os.getcwd(), os.getenv("DATABASE", "database.db")),
+        DATABASE_POOL_SIZE=int(os.getenv("DATABASE_POOL_SIZE", "5")),
+        DATABASE_READ_POOL_SIZE=int(os.getenv("DATABASE_READ_POOL_SIZE", "10")),
+        DATABASE_POOL_TIMEOUT=float(os.getenv("DATABASE_POOL_TIMEOUT", "5")),
+        DATABASE_BUSY_RETRIES=int(os.getenv("DATABASE_BUSY_RETRIES", "3")),
+        DATABASE_BUSY_RETRY_DELAY_MS=float(os.getenv("DATABASE_BUSY_RETRY_DELAY_MS", "50")),
+        DATABASE_GROUP_COMMIT=os.getenv("DATABASE_GROUP_COMMIT", "0") == "1",
+        DATABASE_GROUP_COMMIT_WINDOW_MS=float(os.getenv("DATABASE_GROUP_COMMIT_WINDOW_MS", "5")),
+        DATABASE_GROUP_COMMIT_MAX_BATCH=int(os.getenv("DATABASE_GROUP_COMMIT_MAX_BATCH", "64")),
+        DATABASE_STATS_LOG_INTERVAL=float(os.getenv("DATABASE_STATS_LOG_INTERVAL", "60")),
+        SQLITE_PROFILE=os.getenv("SQLITE_PROFILE", "balanced"),
+        SQLITE_PRAGMAS={},
+        SQL_SLOW_QUERY_MS=float(os.getenv("SQL_SLOW_QUERY_MS", "100")),
+        SQL_SERVER_TIMING=os.getenv("SQL_SERVER_TIMING", "1") == "1",
+        SQL_DEBUG_FOOTER=os.getenv("SQL_DEBUG_FOOTER", "0") == "1",
+        PAGE_SIZE=int(os.getenv("PAGE_SIZE", "20")),
         SECRET_KEY=os.getenv("SECRET_KEY", "dev")
     )
     if config is not None:
@@ -25,7 +40,7 @@ def create_app(config: dict = None):
 
     @login_manager.user_loader
     def load_user(user_id):
-        return find_user_with_id(user_id)
+        return find_user_with_id(int(user_id))
 
     @app.route("/favicon.ico")
     def favicon():
@@ -5,7 +5,7 @@ from webapp.db.accounting import register_user, find_user_with_email, \
     AlreadyRegisteredException
 from webapp.db.notifications import disconnect_telegram, find_telegram_for, \
     add_notification
-from webapp.db.courses import find_courses_created_by, find_comments_left_by
+from webapp.db.profile import find_profile_summary
 from webapp.forms.accounting import RegistrationForm, LoginForm
 
 accounting_bp = Blueprint("accounting", __name__)
@@ -50,13 +50,12 @@ def register():
         return render_template("register.html", form=form, errors=errors,
                                title="Регистрация")
     try:
-        register_user(form.login.data, form.email.data, form.password.data)
+        user = register_user(form.login.data, form.email.data, form.password.data)
     except AlreadyRegisteredException:
         errors = ["Пользователь с таким логином или email уже зарегистрирован!"]
         return render_template("register.html", form=form, errors=errors,
                                title="Регистрация")
     current_app.logger.debug("User %s registred", form.login.data)
-    user = find_user_with_email(form.email.data)
     login_user(user)
     return redirect(url_for("index"))
 
@@ -64,12 +63,16 @@ def register():
 @accounting_bp.route("/")
 @login_required
 def profile():
-    courses = find_courses_created_by(current_user)
-    comments = find_comments_left_by(current_user)
-    telegram_account = find_telegram_for(current_user)
+    courses_after = request.args.get("courses_after", 0, type=int)
+    comments_before = request.args.get("comments_before", type=int)
+    summary = find_profile_summary(current_user, current_app.config["PAGE_SIZE"],
+                                   courses_after=courses_after, comments_before=comments_before)
     verification_code = current_user.get_verification_code()
-    return render_template("profile.html", courses=courses, comments=comments,
-                           telegram_account=telegram_account,
+    return render_template("profile.html", courses=summary.courses, comments=summary.comments,
+                           courses_after=courses_after, comments_before=comments_before,
+                           has_more_courses=summary.has_more_courses,
+                           has_more_comments=summary.has_more_comments,
+                           telegram_account=summary.telegram_account,
                            verification_code=verification_code,
                            title="Моя страница")
 
@@ -1,6 +1,5 @@
 import base64
 import io
-from collections import OrderedDict
 from functools import partial
 
 from flask import Blueprint, request, render_template, redirect, url_for, \
@@ -9,25 +8,30 @@ from flask_login import login_required, current_user
 from PIL import Image as PILImage
 
 import webapp.db.courses as db
-from webapp.db.notifications import add_notification, find_telegram_for
+from webapp.db import transaction
+from webapp.db.notifications import add_notification, find_telegram_for, notify_course_subscribers
 from webapp.forms.courses import CourseForm, ArticleForm, CommentForm
-from webapp.models.courses import Article, Comment, Image
-from webapp.utils import _is_image
+from webapp.models.courses import Article, Image
+from webapp.utils import _is_image, split_page
 
 courses_bp = Blueprint("courses", __name__)
 
 
 @courses_bp.route("/")
 def show_all_courses():
+    page_size = current_app.config["PAGE_SIZE"]
+    after = request.args.get("after", 0, type=int)
     if current_user.is_authenticated:
-        favored_courses = db.find_courses_favored_by(current_user)
-        other_courses = [c for c in db.find_all_courses() if c not in favored_courses]
-        courses = favored_courses + other_courses
+        courses_with_flags, has_next_page = split_page(
+            db.find_all_courses_for(current_user, after, page_size + 1), page_size)
+        courses = [course for course, _ in courses_with_flags]
+        favored_course_ids = {course.id for course, is_favored in courses_with_flags if is_favored}
     else:
-        courses = db.find_all_courses()
-        favored_courses = []
+        courses, has_next_page = split_page(db.find_all_courses(after, page_size + 1), page_size)
+        favored_course_ids = set()
     return render_template("all_courses.html", courses=courses,
-                           favored_courses=favored_courses)
+                           favored_course_ids=favored_course_ids,
+                           has_next_page=has_next_page)
 
 
 @courses_bp.route("/course-<int:course_id>/favour", methods=("POST",))
@@ -67,9 +71,11 @@ def create_course():
         errors = [f"Курс «{form.title.data}» уже существует"]
         return render_template_(errors=errors)
     current_app.logger.debug("Course '%s' created by user %s", form.title.data, current_user.login)
+    page_size = current_app.config["PAGE_SIZE"]
+    courses, has_next_page = split_page(db.find_all_courses(limit=page_size + 1), page_size)
     return render_template("all_courses.html",
                            messages=[f"Курс «{form.title.data}» успешно создан"],
-                           courses=db.find_all_courses())
+                           courses=courses, has_next_page=has_next_page)
 
 
 @courses_bp.route("/course-<int:course_id>")
@@ -77,9 +83,12 @@ def show_course(course_id: int):
     course = db.find_course_with_id(course_id)
     if course is None:
         abort(404)
-    articles = db.find_articles_for(course)
+    page_size = current_app.config["PAGE_SIZE"]
+    articles, has_next_page = split_page(
+        db.find_articles_for(course, request.args.get("after", 0, type=int), page_size + 1), page_size)
     return render_template("course.html", title=course.title,
-                           course=course, articles=articles)
+                           course=course, articles=articles,
+                           has_next_page=has_next_page)
 
 
 @courses_bp.route("/course-<int:course_id>/new-article")
@@ -89,14 +98,13 @@ def create_article(course_id: int):
     if course is None:
         abort(404)
     try:
-        db.add_article("", "", course, current_user)
+        with transaction():
+            created_article = db.add_article("", "", course, current_user)
+            notify_course_subscribers(course,
+                                      f"В курсе {course.title} опубликована новая статья",
+                                      url_for(".show_article", article_id=created_article.id, course_id=course.id))
     except db.StudentsCannotCreateArticles:
         abort(404)
-    created_article = db.find_articles_for(course)[-1]
-    for user in filter(lambda x: find_telegram_for(x) is not None, db.find_users_favoring_course(course)):
-        add_notification(user,
-                         f"В курсе {course.title} опубликована новая статья",
-                         url_for(".show_article", article_id=created_article.id, course_id=course.id))
     return redirect(url_for(".edit_article",
                             course_id=course_id,
                             article_id=created_article.id))
@@ -105,9 +113,8 @@ def create_article(course_id: int):
 @courses_bp.route("/course-<int:course_id>/article-<int:article_id>/edit", methods=("GET", "POST"))
 @login_required
 def edit_article(course_id: int, article_id: int):
-    course = db.find_course_with_id(course_id)
-    article = db.find_article_with_id(article_id)
-    if course is None or article is None or current_user != article.author:
+    course, article, _ = _resolve_article(course_id, article_id)
+    if current_user != article.author:
         abort(404)
     form = ArticleForm()
     if not form.validate_on_submit():
@@ -118,10 +125,11 @@ def edit_article(course_id: int, article_id: int):
     try:
         images = [_load_image(storage) for storage in form.images.data
                   if _is_image(storage)]
-        for image in images:
-            db.add_image(image, article, current_user)
-        db.edit_article(article, form.title.data,
-                        form.text.data.replace('\r\n', '\n'), current_user)
+        with transaction():
+            for image in images:
+                db.add_image(image, article, current_user)
+            db.edit_article(article, form.title.data,
+                            form.text.data.replace('\r\n', '\n'), current_user)
     except db.StudentsCannotEditArticles:
         abort(404)
     current_app.logger.debug("Article '%s' edited", article.title)
@@ -130,37 +138,31 @@ def edit_article(course_id: int, article_id: int):
 
 @courses_bp.route("/course-<int:course_id>/article-<int:article_id>")
 def show_article(course_id: int, article_id: int):
-    course = db.find_course_with_id(course_id)
-    article = db.find_article_with_id(article_id)
-    if course is None or article is None:
-        abort(404)
-    comments = _collect_comments_for(article)
+    course, article, _ = _resolve_article(course_id, article_id)
     images = [_dump_image(image) for image in db.find_images_in(article)]
     form = CommentForm()
     return render_template("article.html", title=article.title, form=form,
-                           course=course, article=article, comments=comments,
-                           images=images)
+                           course=course, article=article, images=images,
+                           **_comments_page(article, request.args.get("after", 0, type=int)))
 
 
 @courses_bp.route("/course-<int:course_id>/article-<int:article_id>/new-comment",
                   methods=("POST",))
 @login_required
 def create_comment(course_id: int, article_id: int):
-    course = db.find_course_with_id(course_id)
-    article = db.find_article_with_id(article_id)
-    if course is None or article is None:
-        abort(404)
+    course, article, _ = _resolve_article(course_id, article_id)
     form = CommentForm()
     if not form.validate_on_submit():
         errors = ['; '.join(map(str, e)) for e in form.errors.values()]
         return render_template("article.html", title=article.title,
                                course=course, article=article, errors=errors,
-                               comments=_collect_comments_for(article))
-    db.left_comment_for(form.text.data, article, current_user)
-    if current_user != article.author and find_telegram_for(article.author) is not None:
-        add_notification(article.author,
-                         "Ученик прокомментировал вашу статью",
-                         url_for(".show_article", article_id=article.id, course_id=course.id))
+                               **_comments_page(article))
+    with transaction():
+        db.left_comment_for(form.text.data, article, current_user)
+        if current_user != article.author and find_telegram_for(article.author) is not None:
+            add_notification(article.author,
+                             "Ученик прокомментировал вашу статью",
+                             url_for(".show_article", article_id=article.id, course_id=course.id))
     return redirect(url_for(".show_article", article_id=article.id, course_id=course.id))
 
 
@@ -168,28 +170,25 @@ def create_comment(course_id: int, article_id: int):
                   methods=("POST",))
 @login_required
 def reply_to_comment(course_id: int, article_id: int, comment_id: int):
-    course = db.find_course_with_id(course_id)
-    article = db.find_article_with_id(article_id)
-    comment = db.find_comment_with_id(comment_id)
-    if course is None or article is None or comment is None:
-        abort(404)
+    course, article, comment = _resolve_article(course_id, article_id, comment_id)
     form = CommentForm()
     if not form.validate_on_submit():
         errors = ['; '.join(map(str, e)) for e in form.errors.values()]
         return render_template("article.html", title=article.title,
                                course=course, article=article, errors=errors,
-                               comments=_collect_comments_for(article))
+                               **_comments_page(article))
     try:
-        db.reply_at_comment(form.text.data, comment, current_user)
+        with transaction():
+            db.reply_at_comment(form.text.data, comment, current_user)
+            if current_user != comment.author and find_telegram_for(comment.author) is not None:
+                add_notification(comment.author,
+                                 "Преподаватель оставил ответ на ваш комментарий",
+                                 url_for(".show_article", article_id=article.id, course_id=course.id))
     except db.StudentsCannotReplyAtComments:
         errors = ["Только преподаватель может отвечать на комментарии!"]
         return render_template("article.html", title=article.title,
                                course=course, article=article, errors=errors,
-                               comments=_collect_comments_for(article))
-    if current_user != comment.author and find_telegram_for(comment.author) is not None:
-        add_notification(comment.author,
-                         "Преподаватель оставил ответ на ваш комментарий",
-                         url_for(".show_article", article_id=article.id, course_id=course.id))
+                               **_comments_page(article))
     return redirect(url_for(".show_article", article_id=article.id, course_id=course.id))
 
 
@@ -197,41 +196,43 @@ def reply_to_comment(course_id: int, article_id: int, comment_id: int):
                   methods=("POST",))
 @login_required
 def delete_comment(course_id: int, article_id: int, comment_id: int):
-    course = db.find_course_with_id(course_id)
-    article = db.find_article_with_id(article_id)
-    comment = db.find_comment_with_id(comment_id)
-    if course is None or article is None or comment is None:
-        abort(404)
+    course, article, comment = _resolve_article(course_id, article_id, comment_id)
     try:
         db.delete_comment(comment, current_user)
     except db.StudentsCannotDeleteComments:
         errors = ["Только преподаватель может удалять на комментарии!"]
         return render_template("article.html", title=article.title,
                                course=course, article=article, errors=errors,
-                               comments=_collect_comments_for(article))
+                               **_comments_page(article))
     return redirect(url_for(".show_article", article_id=article.id, course_id=course.id))
 
 
 @courses_bp.route("/comment-<int:comment_id>")
 def link_to_comment(comment_id: int):
-    comment = db.find_comment_with_id(comment_id)
-    if comment is None:
+    location = db.find_comment_location(comment_id)
+    if location is None:
         abort(404)
-    article = db.find_article_comment_was_left_for(comment)
-    if article is None:
-        abort(404)
-    course = db.find_course_for_article(article)
-    if course is None:
+    course_id, article_id, root_id = location
+    # страница комментариев, начинающаяся с исходного комментария ветки
+    return redirect(url_for(".show_article", course_id=course_id, article_id=article_id,
+                            after=root_id - 1, _anchor=f"comment-{comment_id}"))
+
+
+def _resolve_article(course_id: int, article_id: int, comment_id: int = None):
+    """
+    Получить курс, статью и, опционально, комментарий по параметрам пути одним запросом.
+    Если какого-то из них нет или они не относятся друг к другу, запрос завершается ошибкой 404
+    """
+    resolved = db.find_article_in_course(course_id, article_id, comment_id)
+    if resolved is None:
         abort(404)
-    return redirect(url_for(".show_article", course_id=course.id, article_id=article.id,
-                            _anchor=f"comment-{comment_id}"))
+    return resolved
 
 
-def _collect_comments_for(article: Article) -> OrderedDict[Comment, list[Comment]]:
-    result = OrderedDict()
-    for comment in db.find_comments_left_for(article):
-        result[comment] = db.find_comments_replied_at(comment)
-    return result
+def _comments_page(article: Article, after: int = 0) -> dict:
+    page_size = current_app.config["PAGE_SIZE"]
+    comments, has_next_page = split_page(db.find_comment_tree_for(article, after, page_size + 1), page_size)
+    return {"comments": comments, "has_next_page": has_next_page}
 
 
 def _load_image(image_form_data) -> PILImage:
@@ -1,42 +1,313 @@
+import json
+import logging
 import os
+import pathlib
 import sqlite3
+import time
+from contextlib import contextmanager
+from functools import partial
+from typing import Callable, TypeVar
 
 import click
-from flask import Flask, current_app, g
+from flask import Flask, Response, current_app, g
+
+from webapp.db.instrumentation import InstrumentedConnection, add_server_timing, \
+    get_query_stats
+from webapp.db.locking import LockStats, acquire_write_lock
+from webapp.db.pool import ConnectionPool, PoolExhausted
+from webapp.db.pragmas import resolve_pragmas, apply_pragmas, describe_pragmas
+from webapp.db.writer import GroupCommitWriter
+
+T = TypeVar("T")
 
 
 def init_app(app: Flask):
+    db_name = app.config["DATABASE"]
+    db_address = os.path.join(os.getcwd(), db_name) if db_name != ":memory:" else db_name
+    pragmas = resolve_pragmas(app.config["SQLITE_PROFILE"], app.config["SQLITE_PRAGMAS"])
+    timeout = app.config["DATABASE_POOL_TIMEOUT"]
+    app.extensions["db_pragmas"] = pragmas
+    app.extensions["db_lock_stats"] = LockStats()
+    app.extensions["db_stats_logged"] = (time.monotonic(), {})
+    if db_name == ":memory:":
+        # каждое соединение с :memory: видит собственную базу данных,
+        # поэтому для неё в пуле держится ровно одно соединение,
+        # которое используется и для чтения, и для записи,
+        # а отдельный поток записи не запускается
+        app.extensions["db_pool"] = ConnectionPool(partial(_connect, db_address, pragmas),
+                                                   size=1, timeout=timeout)
+        app.extensions["db_read_pool"] = None
+        app.extensions["db_writer"] = None
+    else:
+        app.extensions["db_pool"] = ConnectionPool(partial(_connect, db_address, pragmas),
+                                                   size=app.config["DATABASE_POOL_SIZE"],
+                                                   timeout=timeout)
+        app.extensions["db_read_pool"] = ConnectionPool(partial(_connect_read_only, db_address, pragmas),
+                                                        size=app.config["DATABASE_READ_POOL_SIZE"],
+                                                        timeout=timeout)
+        app.extensions["db_writer"] = GroupCommitWriter(
+            app,
+            window=app.config["DATABASE_GROUP_COMMIT_WINDOW_MS"] / 1000,
+            max_batch=app.config["DATABASE_GROUP_COMMIT_MAX_BATCH"]
+        ) if app.config["DATABASE_GROUP_COMMIT"] else None
     app.teardown_appcontext(close_db)
+    app.after_request(add_server_timing)
+    app.after_request(log_db_stats)
+    app.context_processor(lambda: {"sql_stats": get_query_stats()})
     app.cli.add_command(init_db_command)
+    from webapp.db.migrations import migrate_command
+    app.cli.add_command(migrate_command)
+    from webapp.db.backup import backup_db_command, restore_db_command
+    app.cli.add_command(backup_db_command)
+    app.cli.add_command(restore_db_command)
+    from webapp.db.counters import verify_counters_command, recompute_counters_command
+    app.cli.add_command(verify_counters_command)
+    app.cli.add_command(recompute_counters_command)
 
 
 def init_db():
+    from webapp.db.migrations import migrate
     db = get_connection()
     with current_app.open_resource("db-schema.sql") as f:
         db.executescript(f.read().decode("utf-8"))
+    migrate()
+
+
+def get_pool() -> ConnectionPool:
+    return current_app.extensions["db_pool"]
+
+
+def get_read_pool() -> ConnectionPool | None:
+    return current_app.extensions["db_read_pool"]
 
 
 def get_connection():
+    """
+    Соединение для записи в базу данных, выданное на время текущего контекста приложения
+    """
     if "db" not in g:
-        db_name = current_app.config['DATABASE']
-        db_address = os.path.join(os.getcwd(), db_name) if db_name != ":memory:" else db_name
-        current_app.logger.debug("Connecting to the database %s", db_name)
-        g.db = sqlite3.connect(db_address)
-        g.db.row_factory = sqlite3.Row
+        g.db = _checkout(get_pool())
     return g.db
 
 
+def get_read_connection():
+    """
+    Соединение только для чтения, выданное на время текущего контекста приложения.
+    Если в текущем контексте уже открыта транзакция на запись,
+        возвращается соединение для записи, чтобы чтение видело ещё не сохранённые изменения
+    """
+    if get_read_pool() is None or ("db" in g and g.db.in_transaction):
+        return get_connection()
+    if "db_reader" not in g:
+        g.db_reader = _checkout(get_read_pool())
+    return g.db_reader
+
+
+def get_writer() -> GroupCommitWriter | None:
+    return current_app.extensions["db_writer"]
+
+
+def execute_write(operation: Callable[[sqlite3.Connection], T]) -> T:
+    """
+    Выполнить операцию записи и сохранить её результат в базе данных.
+    Внутри области transaction() изменения сохраняются только при выходе из внешней области.
+    Иначе, если включена групповая фиксация (DATABASE_GROUP_COMMIT), операция выполняется потоком записи
+        вместе с операциями других запросов, а если нет — соединением текущего контекста.
+    Если операция выбросила исключение, её изменения отменяются, а исключение выбрасывается повторно.
+    Поток записи выполняет операцию вне контекста запроса, где current_user и g недоступны,
+        поэтому все нужные ей значения (в том числе id пользователей) должны быть прочитаны до её создания
+    :param operation: функция, выполняющая запись с помощью переданного ей соединения
+    :return: результат, возвращённый операцией
+    """
+    if g.get("db_transaction_depth", 0) > 0:
+        with transaction() as connection:
+            return operation(connection)
+    writer = get_writer()
+    if writer is not None:
+        return writer.submit(operation)
+    connection = get_connection()
+    if not connection.in_transaction:
+        begin_write(connection)
+    try:
+        result = operation(connection)
+    except Exception:
+        connection.rollback()
+        raise
+    connection.commit()
+    return result
+
+
+def begin_write(connection: sqlite3.Connection):
+    """
+    Начать в переданном соединении транзакцию на запись, захватив блокировку записи.
+    Если база данных заблокирована другим соединением, захват повторяется
+        DATABASE_BUSY_RETRIES раз со случайной задержкой от DATABASE_BUSY_RETRY_DELAY_MS миллисекунд
+    """
+    retries = current_app.config["DATABASE_BUSY_RETRIES"]
+    try:
+        acquire_write_lock(connection, current_app.extensions["db_lock_stats"], retries=retries,
+                           retry_delay=current_app.config["DATABASE_BUSY_RETRY_DELAY_MS"] / 1000)
+    except sqlite3.OperationalError as e:
+        current_app.logger.warning("Failed to acquire database write lock after %s retries: %s", retries, e)
+        raise
+
+
+def get_lock_stats() -> dict:
+    """
+    Статистика конкуренции за блокировку записи: количество ожиданий, ошибок SQLITE_BUSY,
+        повторных попыток и неудачных захватов, а также гистограмма времени ожидания
+    """
+    return current_app.extensions["db_lock_stats"].to_dict()
+
+
+def get_db_stats() -> dict:
+    """
+    Статистика работы с базой данных с момента запуска приложения:
+    пулов соединений для записи (pool) и только для чтения (read-pool, None, если пул не используется),
+    потока записи (writer, None, если групповая фиксация выключена) и блокировки записи (locks)
+    """
+    read_pool, writer = get_read_pool(), get_writer()
+    return {
+        "pool": get_pool().stats(),
+        "read-pool": read_pool.stats() if read_pool is not None else None,
+        "writer": writer.stats() if writer is not None else None,
+        "locks": get_lock_stats()
+    }
+
+
+def log_db_stats(response: Response) -> Response:
+    """
+    Не чаще раза в DATABASE_STATS_LOG_INTERVAL секунд записать в лог статистику get_db_stats.
+    Если с прошлой записи появились ошибки SQLITE_BUSY, неудачные захваты блокировки записи
+        или случаи исчерпания пула, статистика записывается как предупреждение
+    """
+    interval = current_app.config["DATABASE_STATS_LOG_INTERVAL"]
+    logged_at, previous = current_app.extensions["db_stats_logged"]
+    now = time.monotonic()
+    if interval <= 0 or now - logged_at < interval:
+        return response
+    stats = get_db_stats()
+    counters = _contention_counters(stats)
+    current_app.extensions["db_stats_logged"] = (now, counters)
+    contended = any(value > previous.get(name, 0) for name, value in counters.items())
+    current_app.logger.log(logging.WARNING if contended else logging.INFO,
+                           "Database stats: %s", json.dumps(stats))
+    return response
+
+
+def _contention_counters(stats: dict) -> dict:
+    counters = {
+        "busy": stats["locks"]["busy"],
+        "failures": stats["locks"]["failures"],
+        "pool-exhausted": stats["pool"]["exhausted"]
+    }
+    if stats["read-pool"] is not None:
+        counters["read-pool-exhausted"] = stats["read-pool"]["exhausted"]
+    return counters
+
+
+@contextmanager
+def transaction():
+    """
+    Область, все изменения внутри которой сохраняются в базе данных одной транзакцией.
+    Вспомогательные функции записи внутри области не сохраняют изменения сами,
+        а откладывают сохранение до выхода из самой внешней области.
+    Если из области выброшено исключение, все её изменения отменяются.
+    Вложенные области реализованы с помощью точек сохранения (SAVEPOINT),
+        поэтому исключение, перехваченное между вложенной и внешней областями,
+        отменяет только изменения вложенной области
+    """
+    connection = get_connection()
+    depth = g.get("db_transaction_depth", 0)
+    savepoint = f"transaction_{depth}"
+    if depth == 0:
+        begin_write(connection)
+    else:
+        connection.execute(f"SAVEPOINT {savepoint};")
+    g.db_transaction_depth = depth + 1
+    try:
+        yield connection
+    except BaseException:
+        if depth == 0:
+            connection.rollback()
+        else:
+            connection.execute(f"ROLLBACK TO {savepoint};")
+            connection.execute(f"RELEASE {savepoint};")
+        raise
+    else:
+        if depth == 0:
+            try:
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+        else:
+            connection.execute(f"RELEASE {savepoint};")
+    finally:
+        g.db_transaction_depth = depth
+
+
+def close_pools(app: Flask):
+    """
+    Остановить поток записи и закрыть все свободные соединения из пулов приложения
+    """
+    if app.extensions["db_writer"] is not None:
+        app.extensions["db_writer"].close()
+    app.extensions["db_pool"].close()
+    if app.extensions["db_read_pool"] is not None:
+        app.extensions["db_read_pool"].close()
+
+
+def _checkout(pool: ConnectionPool) -> sqlite3.Connection:
+    started_at = time.monotonic()
+    try:
+        connection = pool.checkout()
+    except PoolExhausted:
+        current_app.logger.warning("Database connection pool exhausted: %s", pool.stats())
+        raise
+    current_app.logger.debug("Checked out database connection in %.3f ms",
+                             (time.monotonic() - started_at) * 1000)
+    return connection
+
+
 def close_db(e=None):
     db = g.pop("db", None)
     if db is not None:
-        current_app.logger.debug("Disconnecting from the database")
-        db.close()
+        current_app.logger.debug("Returning database connection to the pool")
+        get_pool().checkin(db)
+    db_reader = g.pop("db_reader", None)
+    if db_reader is not None:
+        current_app.logger.debug("Returning read-only database connection to the pool")
+        get_read_pool().checkin(db_reader)
+
+
+def _connect(db_address: str, pragmas: dict) -> sqlite3.Connection:
+    current_app.logger.debug("Connecting to the database %s", db_address)
+    connection = sqlite3.connect(db_address, check_same_thread=False,
+                                 factory=InstrumentedConnection,
+                                 cached_statements=pragmas["statement_cache_size"])
+    connection.row_factory = sqlite3.Row
+    apply_pragmas(connection, pragmas)
+    return connection
+
+
+def _connect_read_only(db_address: str, pragmas: dict) -> sqlite3.Connection:
+    current_app.logger.debug("Connecting to the database %s in read-only mode", db_address)
+    connection = sqlite3.connect(f"{pathlib.Path(db_address).as_uri()}?mode=ro", uri=True,
+                                 check_same_thread=False,
+                                 factory=InstrumentedConnection,
+                                 cached_statements=pragmas["statement_cache_size"])
+    connection.row_factory = sqlite3.Row
+    # режим журнала задаётся соединениями для записи и хранится в самом файле базы данных
+    apply_pragmas(connection, {name: value for name, value in pragmas.items()
+                               if name != "journal_mode"})
+    connection.execute("PRAGMA query_only = ON;")
+    return connection
 
 
 @click.command("init-db")
 def init_db_command():
     init_db()
     click.echo("Initialized database")
-
-
-
+    click.echo(f"SQLite profile '{current_app.config['SQLITE_PROFILE']}': "
+               f"{describe_pragmas(current_app.extensions['db_pragmas'])}")
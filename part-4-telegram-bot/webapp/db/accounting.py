@@ -1,6 +1,9 @@
 import sqlite3
 
-from webapp.db import get_connection
+from flask import g
+
+from webapp.db import get_read_connection, execute_write
+from webapp.db.loader import batches, placeholders, get_loader
 from webapp.models.accounting import User
 
 
@@ -8,7 +11,7 @@ class AlreadyRegisteredException(Exception):
     pass
 
 
-def register_user(login: str, email: str, password: str):
+def register_user(login: str, email: str, password: str) -> User:
     """
     Зарегистрировать в системе нового пользователя.
     В случае, если пользователь с таким логином или email уже существует,
@@ -16,21 +19,27 @@ def register_user(login: str, email: str, password: str):
     :param login: логин пользователя
     :param email: email пользователя
     :param password: пароль пользователя
+    :return: зарегистрированный пользователь
     """
-    connection = get_connection()
-    cursor = connection.cursor()
-    # более правильный способ, но требует блокировки БД
-    # if find_user_with_email(email) or find_user_with_login(login):
-    #     raise AlreadyRegisteredException()
-    try:
-        cursor.execute("""
-            INSERT INTO users (login, email, password_hash)
-            VALUES (?, ?, ?);
-        """, (login, email, User.generate_password_hash(password)))
-    except sqlite3.IntegrityError as e:
-        if "users.email" in str(e) or "users.login" in str(e):
-            raise AlreadyRegisteredException()
-    connection.commit()
+    password_hash = User.generate_password_hash(password)
+
+    def insert(connection):
+        # более правильный способ, но требует блокировки БД
+        # if find_user_with_email(email) or find_user_with_login(login):
+        #     raise AlreadyRegisteredException()
+        try:
+            return connection.cursor().execute("""
+                INSERT INTO users (login, email, password_hash)
+                VALUES (?, ?, ?);
+            """, (login, email, password_hash)).lastrowid
+        except sqlite3.IntegrityError as e:
+            if "users.email" in str(e) or "users.login" in str(e):
+                raise AlreadyRegisteredException()
+            raise
+
+    user = User(execute_write(insert), login, email, password_hash)
+    _get_identity_map()[user.id] = user
+    return user
 
 
 def find_user_with_email(email: str) -> User | None:
@@ -39,29 +48,90 @@ def find_user_with_email(email: str) -> User | None:
     :param email: адрес электронной почты
     :return: пользователь или None, если пользователя с заданным email не существует
     """
-    record = get_connection().cursor().execute("""
+    record = get_read_connection().cursor().execute("""
         SELECT id, login, email, password_hash
         FROM users
         WHERE email = ?;
     """, (email,)).fetchone()
     if record is None:
         return None
-    return User(record["id"], record["login"], record["email"], record["password_hash"])
+    return user_from_record(record)
 
 
 def find_user_with_id(id_: int) -> User | None:
     """
-    Найти и получить пользователя с указанным id
+    Найти и получить пользователя с указанным id.
+    Пользователь, уже загруженный в текущем запросе, повторно из базы данных не загружается
     :param id_:
     :return: пользователь или None, если пользователя с заданным id не существует
     """
-    record = get_connection().cursor().execute("""
+    user = _get_identity_map().get(id_)
+    if user is not None:
+        return user
+    record = get_read_connection().cursor().execute("""
         SELECT id, login, email, password_hash
         FROM users
         WHERE id = ?;
     """, (id_,)).fetchone()
     if record is None:
         return None
-    return User(record["id"], record["login"], record["email"], record["password_hash"])
+    return user_from_record(record)
+
+
+def find_users_with_ids(ids: list[int]) -> dict[int, User]:
+    """
+    Найти и получить пользователей с указанными id.
+    Пользователи, ещё не загруженные в текущем запросе, загружаются запросами WHERE id IN (...)
+    :param ids: id пользователей
+    :return: словарь найденных пользователей по их id; id несуществующих пользователей в нём отсутствуют
+    """
+    identity_map = _get_identity_map()
+    result = {id_: identity_map[id_] for id_ in ids if id_ in identity_map}
+    cursor = get_read_connection().cursor()
+    for batch in batches(id_ for id_ in ids if id_ not in result):
+        records = cursor.execute(f"""
+            SELECT id, login, email, password_hash
+            FROM users
+            WHERE id IN ({placeholders(batch)});
+        """, batch).fetchall()
+        for record in records:
+            user = user_from_record(record)
+            result[user.id] = user
+    return result
+
+
+def user_from_record(record: sqlite3.Row, prefix: str = "") -> User:
+    """
+    Построить пользователя по строке результата запроса.
+    Позволяет получать автора курса, статьи или комментария тем же запросом (через JOIN с users),
+        не выполняя отдельного find_user_with_id для каждой строки
+    :param record: строка, содержащая столбцы id, login, email и password_hash пользователя
+    :param prefix: общий префикс названий этих столбцов в строке (например, "u_")
+    """
+    identity_map = _get_identity_map()
+    user = identity_map.get(record[f"{prefix}id"])
+    if user is None:
+        user = User(record[f"{prefix}id"], record[f"{prefix}login"],
+                    record[f"{prefix}email"], record[f"{prefix}password_hash"])
+        identity_map[user.id] = user
+    return user
+
+
+def invalidate_user(id_: int):
+    """
+    Забыть загруженного в текущем запросе пользователя с заданным id,
+        чтобы следующий поиск получил его из базы данных заново.
+    Должна вызываться после каждого изменения данных пользователя
+    :param id_: id изменённого пользователя
+    """
+    _get_identity_map().pop(id_, None)
+    get_loader(find_users_with_ids).clear(id_)
 
 
+def _get_identity_map() -> dict[int, User]:
+    # пользователи, загруженные в текущем контексте приложения, по их id:
+    # каждый пользователь строится один раз, и все курсы, статьи и комментарии
+    # этого запроса ссылаются на один и тот же объект User
+    if "users" not in g:
+        g.users = {}
+    return g.users
@@ -0,0 +1,173 @@
+import os
+import pathlib
+import sqlite3
+import time
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from webapp.db import get_connection, get_read_connection
+
+BACKUP_FILE_FORMAT = "database-%Y%m%d-%H%M%S-%f.db"
+
+
+class CorruptedBackup(Exception):
+    pass
+
+
+def backup_database(target: str, pages: int = 256, sleep: float = 0.01) -> dict:
+    """
+    Скопировать базу данных в файл target, не останавливая приложение.
+    Копирование выполняется с помощью sqlite3 backup API порциями по pages страниц
+        с паузой sleep секунд между ними, поэтому блокировка базы данных удерживается
+        только на время копирования одной порции и не мешает обработке запросов.
+    Параметр sleep самого backup API задаёт паузу только после SQLITE_BUSY и SQLITE_LOCKED,
+        поэтому пауза между порциями делается в функции, которую backup API вызывает после каждой порции.
+    Копия сначала записывается во временный файл и заменяет target только после завершения,
+        поэтому прерванное копирование не портит предыдущую копию
+    :param target: путь к файлу копии
+    :param pages: количество страниц, копируемых за один шаг
+    :param sleep: пауза между шагами копирования, в секундах
+    :return: статистика копирования: путь к копии, количество страниц, размер в байтах и время в секундах
+    """
+    source = get_read_connection()
+    page_size = source.execute("PRAGMA page_size;").fetchone()[0]
+    temporary_target = f"{target}.part"
+    if os.path.exists(temporary_target):
+        os.remove(temporary_target)
+    progress = {"total": 0}
+
+    def report(status, remaining, total):
+        progress["total"] = total
+        current_app.logger.debug("Backed up %s of %s pages", total - remaining, total)
+        _pause_between_steps(remaining, sleep)
+
+    started_at = time.monotonic()
+    destination = sqlite3.connect(temporary_target)
+    try:
+        source.backup(destination, pages=pages, progress=report, sleep=sleep)
+    finally:
+        destination.close()
+    os.replace(temporary_target, target)
+    return {
+        "path": target,
+        "pages": progress["total"],
+        "bytes": progress["total"] * page_size,
+        "seconds": time.monotonic() - started_at
+    }
+
+
+def backup_to_directory(directory: str, keep: int, pages: int = 256, sleep: float = 0.01) -> dict:
+    """
+    Скопировать базу данных в новый файл в каталоге directory
+        и удалить самые старые копии, оставив не больше keep последних
+    :param directory: каталог с копиями базы данных
+    :param keep: количество хранимых копий
+    :param pages: количество страниц, копируемых за один шаг
+    :param sleep: пауза между шагами копирования, в секундах
+    :return: статистика копирования, как у backup_database
+    """
+    if keep < 1:
+        raise ValueError("At least one backup must be kept")
+    os.makedirs(directory, exist_ok=True)
+    result = backup_database(os.path.join(directory, datetime.now().strftime(BACKUP_FILE_FORMAT)),
+                             pages=pages, sleep=sleep)
+    for file_name in find_backups(directory)[:-keep]:
+        current_app.logger.info("Removing old backup %s", file_name)
+        os.remove(os.path.join(directory, file_name))
+    return result
+
+
+def find_backups(directory: str) -> list[str]:
+    """
+    Имена файлов копий базы данных в каталоге directory, от самой старой к самой новой
+    """
+    result = []
+    for file_name in os.listdir(directory):
+        try:
+            datetime.strptime(file_name, BACKUP_FILE_FORMAT)
+        except ValueError:
+            continue
+        result.append(file_name)
+    return sorted(result)
+
+
+def verify_backup(path: str):
+    """
+    Проверить целостность копии базы данных с помощью PRAGMA integrity_check.
+    Если копия повреждена, выбрасывается CorruptedBackup
+    :param path: путь к файлу копии
+    """
+    if not os.path.isfile(path):
+        raise CorruptedBackup(f"{path} does not exist")
+    connection = _connect_read_only(path)
+    try:
+        problems = [row[0] for row in connection.execute("PRAGMA integrity_check;")]
+    except sqlite3.DatabaseError as e:
+        raise CorruptedBackup(f"{path}: {e}") from e
+    finally:
+        connection.close()
+    if problems != ["ok"]:
+        raise CorruptedBackup(f"{path}: " + "; ".join(problems))
+
+
+def restore_database(source: str, pages: int = 256, sleep: float = 0.01):
+    """
+    Заменить содержимое базы данных копией из файла source, предварительно проверив её целостность.
+    После восстановления к базе данных применяются миграции,
+        которых ещё не было на момент создания копии
+    :param source: путь к файлу копии
+    :param pages: количество страниц, копируемых за один шаг
+    :param sleep: пауза между шагами копирования, в секундах
+    """
+    from webapp.db.migrations import migrate
+    verify_backup(source)
+    backup = _connect_read_only(source)
+    try:
+        backup.backup(get_connection(), pages=pages, sleep=sleep,
+                      progress=lambda status, remaining, total: _pause_between_steps(remaining, sleep))
+    finally:
+        backup.close()
+    migrate()
+
+
+def _pause_between_steps(remaining: int, sleep: float):
+    # после последней порции ждать нечего
+    if remaining > 0 and sleep > 0:
+        time.sleep(sleep)
+
+
+def _connect_read_only(path: str) -> sqlite3.Connection:
+    return sqlite3.connect(f"{pathlib.Path(path).resolve().as_uri()}?mode=ro", uri=True)
+
+
+@click.command("backup-db")
+@click.argument("target")
+@click.option("--keep", type=click.IntRange(min=1), default=None,
+              help="Treat TARGET as a directory of rotating backups and keep this many latest copies")
+@click.option("--pages", type=int, default=256, help="Pages copied per step")
+@click.option("--sleep-ms", type=float, default=10, help="Pause between steps in milliseconds")
+@with_appcontext
+def backup_db_command(target, keep, pages, sleep_ms):
+    if keep is None:
+        result = backup_database(target, pages=pages, sleep=sleep_ms / 1000)
+    else:
+        result = backup_to_directory(target, keep, pages=pages, sleep=sleep_ms / 1000)
+    megabytes = result["bytes"] / 1024 / 1024
+    click.echo(f"Backed up {result['pages']} pages ({megabytes:.1f} MiB) to {result['path']} "
+               f"in {result['seconds']:.2f} s ({megabytes / max(result['seconds'], 1e-6):.1f} MiB/s)")
+
+
+@click.command("restore-db")
+@click.argument("source")
+@click.option("--pages", type=int, default=256, help="Pages copied per step")
+@click.option("--sleep-ms", type=float, default=10, help="Pause between steps in milliseconds")
+@with_appcontext
+def restore_db_command(source, pages, sleep_ms):
+    try:
+        restore_database(source, pages=pages, sleep=sleep_ms / 1000)
+    except CorruptedBackup as e:
+        raise click.ClickException(f"Backup failed integrity check: {e}")
+    click.echo(f"Restored database from {source}")
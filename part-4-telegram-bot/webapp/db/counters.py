@@ -0,0 +1,80 @@
+import click
+from flask.cli import with_appcontext
+
+from webapp.db import get_read_connection, execute_write
+
+# счётчики, поддерживаемые триггерами (см. миграцию 0004_counters):
+# таблица, столбец счётчика и подзапрос, вычисляющий его точное значение для строки t
+COUNTERS = (
+    ("courses", "favored_count", """
+        SELECT COUNT(*)
+        FROM courses_favored_by_users AS f
+        WHERE f.course_id = t.id
+    """),
+    ("courses", "articles_count", """
+        SELECT COUNT(*)
+        FROM articles AS a
+        WHERE a.course_id = t.id
+    """),
+    ("articles", "comments_count", """
+        SELECT COUNT(*)
+        FROM comments AS c
+        WHERE c.root_article_id = t.id AND NOT c.deleted
+    """),
+)
+
+
+def find_counter_drift() -> list[tuple[str, str, int, int, int]]:
+    """
+    Найти строки, в которых сохранённое значение счётчика отличается от вычисленного заново
+    :return: список пятёрок (таблица, столбец, id строки, сохранённое значение, точное значение)
+    """
+    cursor = get_read_connection().cursor()
+    result = []
+    for table, column, actual in COUNTERS:
+        records = cursor.execute(f"""
+            SELECT id, stored, actual
+            FROM (
+                SELECT t.id AS id, t.{column} AS stored, ({actual}) AS actual
+                FROM {table} AS t
+            )
+            WHERE stored != actual
+            ORDER BY id;
+        """).fetchall()
+        result.extend((table, column, r["id"], r["stored"], r["actual"]) for r in records)
+    return result
+
+
+def recompute_counters() -> int:
+    """
+    Пересчитать все счётчики и исправить разошедшиеся с точными значениями
+    :return: количество исправленных значений
+    """
+    def update(connection):
+        fixed = 0
+        for table, column, actual in COUNTERS:
+            fixed += connection.execute(f"""
+                UPDATE {table} AS t
+                SET {column} = ({actual})
+                WHERE {column} != ({actual});
+            """).rowcount
+        return fixed
+
+    return execute_write(update)
+
+
+@click.command("verify-counters")
+@with_appcontext
+def verify_counters_command():
+    drift = find_counter_drift()
+    for table, column, id_, stored, actual in drift:
+        click.echo(f"{table}.{column} of #{id_}: stored {stored}, actual {actual}")
+    if drift:
+        raise click.ClickException(f"{len(drift)} counters drifted, run recompute-counters to fix them")
+    click.echo("All counters are up to date")
+
+
+@click.command("recompute-counters")
+@with_appcontext
+def recompute_counters_command():
+    click.echo(f"Fixed {recompute_counters()} counters")
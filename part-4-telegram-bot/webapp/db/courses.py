@@ -1,10 +1,12 @@
 import io
 import sqlite3
+from collections import OrderedDict
 
 from PIL import Image as PILImage
 
-from webapp.db import get_connection
-from webapp.db.accounting import find_user_with_id
+from webapp.db import get_read_connection, execute_write
+from webapp.db.accounting import find_user_with_id, user_from_record, find_users_with_ids
+from webapp.db.loader import batches, placeholders, get_loader
 from webapp.models.accounting import User
 from webapp.models.courses import Course, Article, Image, Comment
 
@@ -29,7 +31,15 @@ class CourseAlreadyExists(Exception):
     pass
 
 
-def add_course(title: str, description: str, author: User):
+# столбцы автора (пользователя u) в запросах, получающих автора через JOIN с users
+_AUTHOR_COLUMNS = "u.id AS u_id, u.login AS u_login, u.email AS u_email, u.password_hash AS u_password_hash"
+# столбцы курса c и статьи a, включая поддерживаемые триггерами счётчики (см. миграцию 0004_counters)
+_COURSE_COLUMNS = "c.id AS c_id, c.title AS c_title, c.description AS c_description, " \
+                  "c.favored_count AS c_favored_count, c.articles_count AS c_articles_count"
+_ARTICLE_COLUMNS = "a.id AS a_id, a.title AS a_title, a.text AS a_text, a.comments_count AS a_comments_count"
+
+
+def add_course(title: str, description: str, author: User) -> Course:
     """
     Добавляет новый курс от имени переданного пользователя.
     В случае, если курс с таким названием уже существует,
@@ -37,48 +47,92 @@ def add_course(title: str, description: str, author: User):
     :param title: название курса
     :param description: описание курса
     :param author: пользователь, создающий курс
+    :return: созданный курс
     """
-    connection = get_connection()
-    cursor = connection.cursor()
-    try:
-        cursor.execute("""
-            INSERT INTO courses (title, description, author_id)
-            VALUES (?, ?, ?);
-        """, (title, description, author.id))
-    except sqlite3.IntegrityError:
-        raise CourseAlreadyExists()
-    connection.commit()
+    parameters = (title, description, author.id)
+
+    def insert(connection):
+        try:
+            return connection.cursor().execute("""
+                INSERT INTO courses (title, description, author_id)
+                VALUES (?, ?, ?);
+            """, parameters).lastrowid
+        except sqlite3.IntegrityError:
+            raise CourseAlreadyExists()
+
+    return Course(execute_write(insert), title, description, author)
 
 
-def find_all_courses() -> list[Course]:
+def find_all_courses(after_id: int = 0, limit: int = None) -> list[Course]:
     """
     Получить список курсов, созданных в системе
+    :param after_id: id последнего курса предыдущей страницы (0 — с начала списка)
+    :param limit: максимальное количество курсов на странице или None, если количество не ограничено
     :return: список всех курсов в порядке создания (от старых к новым)
     """
-    cursor = get_connection().cursor()
-    records = cursor.execute("""
-        SELECT id, title, description, author_id
-        FROM courses
-        ORDER BY id;
-    """).fetchall()
-    return [Course(r["id"], r["title"],
-                   r["description"], find_user_with_id(r["author_id"]))
-            for r in records]
-
-
-def find_courses_created_by(author: User) -> list[Course]:
+    cursor = get_read_connection().cursor()
+    records = cursor.execute(f"""
+        SELECT {_COURSE_COLUMNS}, {_AUTHOR_COLUMNS}
+        FROM courses AS c
+            JOIN users AS u ON c.author_id = u.id
+        WHERE c.id > ?
+        ORDER BY c.id
+        LIMIT ?;
+    """, (after_id, _limit(limit))).fetchall()
+    return [_course_from_record(r) for r in records]
+
+
+def find_all_courses_for(user: User, after_id: int = 0, limit: int = None) -> list[tuple[Course, bool]]:
+    """
+    Получить список курсов, созданных в системе, с отметкой,
+        добавил ли данный пользователь курс в список избранных
+    :param user: пользователь, для которого отмечаются избранные курсы
+    :param after_id: id последнего курса предыдущей страницы (0 — с начала списка)
+    :param limit: максимальное количество курсов на странице или None, если количество не ограничено
+    :return: список пар (курс, добавлен ли курс в избранное):
+        сначала избранные курсы, затем остальные, и те, и другие в порядке создания (от старых к новым)
+    """
+    # страница продолжается с того же места в порядке (избранный ли курс, id курса),
+    # на котором закончилась предыдущая: после курса after_id
+    records = get_read_connection().cursor().execute(f"""
+        WITH page_cursor (is_favored) AS (
+            SELECT EXISTS (
+                SELECT 1
+                FROM courses_favored_by_users
+                WHERE course_id = :after_id AND user_id = :user_id
+            )
+        )
+        SELECT {_COURSE_COLUMNS}, {_AUTHOR_COLUMNS},
+            f.user_id IS NOT NULL AS is_favored
+        FROM courses AS c
+            JOIN users AS u ON c.author_id = u.id
+            LEFT JOIN courses_favored_by_users AS f ON f.course_id = c.id AND f.user_id = :user_id
+            JOIN page_cursor AS p
+        WHERE :after_id = 0
+            OR (f.user_id IS NOT NULL) < p.is_favored
+            OR ((f.user_id IS NOT NULL) = p.is_favored AND c.id > :after_id)
+        ORDER BY is_favored DESC, c.id
+        LIMIT :limit;
+    """, {"user_id": user.id, "after_id": after_id, "limit": _limit(limit)}).fetchall()
+    return [(_course_from_record(r), bool(r["is_favored"])) for r in records]
+
+
+def find_courses_created_by(author: User, after_id: int = 0, limit: int = None) -> list[Course]:
     """
     Получить список курсов, созданных данным пользователем
     :param author: пользователь-автор курсов
+    :param after_id: id последнего курса предыдущей страницы (0 — с начала списка)
+    :param limit: максимальное количество курсов на странице или None, если количество не ограничено
     :return: список всех курсов автора в порядке создания (от старых к новым)
     """
-    records = get_connection().cursor().execute("""
-        SELECT id, title, description
+    records = get_read_connection().cursor().execute("""
+        SELECT id, title, description, favored_count, articles_count
         FROM courses
-        WHERE author_id = ?
-        ORDER BY id;
-    """, (author.id,))
-    return [Course(r["id"], r["title"], r["description"], author)
+        WHERE author_id = ? AND id > ?
+        ORDER BY id
+        LIMIT ?;
+    """, (author.id, after_id, _limit(limit)))
+    return [Course(r["id"], r["title"], r["description"], author, r["favored_count"], r["articles_count"])
             for r in records]
 
 
@@ -88,16 +142,37 @@ def find_course_with_id(id_: int) -> Course | None:
     :param id_: id курса
     :return: искомый Course или None
     """
-    cursor = get_connection().cursor()
-    record = cursor.execute("""
-        SELECT id, title, description, author_id
-        FROM courses
-        WHERE id = ?;
+    cursor = get_read_connection().cursor()
+    record = cursor.execute(f"""
+        SELECT {_COURSE_COLUMNS}, {_AUTHOR_COLUMNS}
+        FROM courses AS c
+            JOIN users AS u ON c.author_id = u.id
+        WHERE c.id = ?;
     """, (id_,)).fetchone()
     if record is None:
         return None
-    return Course(record["id"], record["title"],
-                  record["description"], find_user_with_id(record["author_id"]))
+    return _course_from_record(record)
+
+
+def find_courses_with_ids(ids: list[int]) -> dict[int, Course]:
+    """
+    Найти курсы с указанными id запросами WHERE id IN (...)
+    :param ids: id курсов
+    :return: словарь найденных курсов по их id; id несуществующих курсов в нём отсутствуют
+    """
+    cursor = get_read_connection().cursor()
+    result = {}
+    for batch in batches(ids):
+        records = cursor.execute(f"""
+            SELECT {_COURSE_COLUMNS}, {_AUTHOR_COLUMNS}
+            FROM courses AS c
+                JOIN users AS u ON c.author_id = u.id
+            WHERE c.id IN ({placeholders(batch)});
+        """, batch).fetchall()
+        for record in records:
+            course = _course_from_record(record)
+            result[course.id] = course
+    return result
 
 
 def add_to_favored_courses(course: Course, user: User):
@@ -106,12 +181,15 @@ def add_to_favored_courses(course: Course, user: User):
     :param course: добавляемый в избранное курс
     :param user: пользователь, для которого курс добавляется в избранное
     """
-    connection = get_connection()
-    connection.cursor().execute("""
-        INSERT INTO courses_favored_by_users (course_id, user_id)
-        VALUES (?, ?);
-    """, (course.id, user.id))
-    connection.commit()
+    parameters = (course.id, user.id)
+
+    def insert(connection):
+        connection.cursor().execute("""
+            INSERT OR IGNORE INTO courses_favored_by_users (course_id, user_id)
+            VALUES (?, ?);
+        """, parameters)
+
+    execute_write(insert)
 
 
 def remove_from_favored_courses(course: Course, user: User):
@@ -120,12 +198,15 @@ def remove_from_favored_courses(course: Course, user: User):
     :param course: добавляемый в избранное курс
     :param user: пользователь, для которого курс добавляется в избранное
     """
-    connection = get_connection()
-    connection.cursor().execute("""
-        DELETE FROM courses_favored_by_users
-        WHERE course_id = ? AND user_id = ?;
-    """, (course.id, user.id))
-    connection.commit()
+    parameters = (course.id, user.id)
+
+    def delete(connection):
+        connection.cursor().execute("""
+            DELETE FROM courses_favored_by_users
+            WHERE course_id = ? AND user_id = ?;
+        """, parameters)
+
+    execute_write(delete)
 
 
 def find_courses_favored_by(user: User) -> list[Course]:
@@ -134,18 +215,16 @@ def find_courses_favored_by(user: User) -> list[Course]:
     :param user: пользователь, избранные курсы которого ищутся
     :return: список курсов, "избранных" данным пользователем, в порядке создания (от старых к новым)
     """
-    cursor = get_connection().cursor()
-    records = cursor.execute("""
-        SELECT c.id AS c_id, c.title AS c_title, c.description AS c_description,
-            c.author_id AS c_author_id
+    cursor = get_read_connection().cursor()
+    records = cursor.execute(f"""
+        SELECT {_COURSE_COLUMNS}, {_AUTHOR_COLUMNS}
         FROM courses_favored_by_users AS c_to_u
-            JOIN users AS u ON c_to_u.user_id = u.id
             JOIN courses AS c ON c_to_u.course_id = c.id
-        WHERE u.id = ?;
+            JOIN users AS u ON c.author_id = u.id
+        WHERE c_to_u.user_id = ?
+        ORDER BY c.id;
     """, (user.id,)).fetchall()
-    return [Course(r["c_id"], r["c_title"], r["c_description"],
-                   find_user_with_id(r["c_author_id"]))
-            for r in records]
+    return [_course_from_record(r) for r in records]
 
 
 def find_users_favoring_course(course: Course) -> list[User]:
@@ -154,16 +233,17 @@ def find_users_favoring_course(course: Course) -> list[User]:
     :param course: курс, для которого ищутся "избравшие" его пользователи
     :return: список пользователей, "избравших" данный курс, в порядке регистрации (от старых к новым)
     """
-    records = get_connection().cursor().execute("""
+    records = get_read_connection().cursor().execute("""
         SELECT DISTINCT user_id
         FROM courses_favored_by_users
         WHERE course_id = ?
         ORDER BY user_id;
     """, (course.id,)).fetchall()
-    return [find_user_with_id(record["user_id"]) for record in records]
+    users = get_loader(find_users_with_ids)
+    return [user() for user in [users.load(record["user_id"]) for record in records]]
 
 
-def add_article(title: str, text: str, course: Course, author: User):
+def add_article(title: str, text: str, course: Course, author: User) -> Article:
     """
     Добавить новую статью в заданный курс.
     В случае, если статью пытается добавить пользователь, не являющийся автором курса,
@@ -172,16 +252,20 @@ def add_article(title: str, text: str, course: Course, author: User):
     :param text: текст добавляемой статьи
     :param course: курс, для которого добавляется статья
     :param author: пользователь, добавляющий статью
+    :return: созданная статья
     """
     if author != course.author:
         raise StudentsCannotCreateArticles()
-    connection = get_connection()
-    cursor = connection.cursor()
-    cursor.execute("""
-        INSERT INTO articles (title, text, course_id, author_id)
-        VALUES (?, ?, ?, ?);
-    """, (title, text, course.id, author.id))
-    connection.commit()
+
+    parameters = (title, text, course.id, author.id)
+
+    def insert(connection):
+        return connection.cursor().execute("""
+            INSERT INTO articles (title, text, course_id, author_id)
+            VALUES (?, ?, ?, ?);
+        """, parameters).lastrowid
+
+    return Article(execute_write(insert), title, text, author)
 
 
 def edit_article(article: Article, new_title: str, new_text: str, editor: User):
@@ -196,13 +280,17 @@ def edit_article(article: Article, new_title: str, new_text: str, editor: User):
     """
     if editor != article.author:
         raise StudentsCannotEditArticles()
-    connection = get_connection()
-    connection.cursor().execute("""
-        UPDATE articles
-        SET title = ?, text = ?
-        WHERE id = ?;
-    """, (new_title, new_text, article.id))
-    connection.commit()
+
+    parameters = (new_title, new_text, article.id)
+
+    def update(connection):
+        connection.cursor().execute("""
+            UPDATE articles
+            SET title = ?, text = ?
+            WHERE id = ?;
+        """, parameters)
+
+    execute_write(update)
 
 
 def find_article_with_id(id_: int) -> Article | None:
@@ -211,9 +299,9 @@ def find_article_with_id(id_: int) -> Article | None:
     :param id_:
     :return: статья или None, если статьи с заданным id не существует
     """
-    cursor = get_connection().cursor()
-    record = cursor.execute("""
-        SELECT a.id as a_id, a.title as a_title, a.text as a_text, u.id as u_id
+    cursor = get_read_connection().cursor()
+    record = cursor.execute(f"""
+        SELECT {_ARTICLE_COLUMNS}, {_AUTHOR_COLUMNS}
         FROM articles as a
             JOIN courses as c ON a.course_id=c.id
             JOIN users as u ON c.author_id=u.id
@@ -221,56 +309,120 @@ def find_article_with_id(id_: int) -> Article | None:
     """, (id_,)).fetchone()
     if record is None:
         return None
-    return Article(record["a_id"], record["a_title"], record["a_text"], find_user_with_id(record["u_id"]))
+    return _article_from_record(record, user_from_record(record, "u_"))
 
 
-def find_articles_for(course: Course) -> list[Article]:
+def find_articles_with_ids(ids: list[int]) -> dict[int, Article]:
+    """
+    Найти статьи с указанными id запросами WHERE id IN (...)
+    :param ids: id статей
+    :return: словарь найденных статей по их id; id несуществующих статей в нём отсутствуют
+    """
+    cursor = get_read_connection().cursor()
+    result = {}
+    for batch in batches(ids):
+        records = cursor.execute(f"""
+            SELECT {_ARTICLE_COLUMNS}, {_AUTHOR_COLUMNS}
+            FROM articles as a
+                JOIN courses as c ON a.course_id=c.id
+                JOIN users as u ON c.author_id=u.id
+            WHERE a.id IN ({placeholders(batch)});
+        """, batch).fetchall()
+        for r in records:
+            result[r["a_id"]] = _article_from_record(r, user_from_record(r, "u_"))
+    return result
+
+
+def find_articles_for(course: Course, after_id: int = 0, limit: int = None) -> list[Article]:
     """
     Получить список статей, добавленных для данного курса
     :param course: курс, статьи в котором получаются
+    :param after_id: id последнего статьи предыдущей страницы (0 — с начала списка)
+    :param limit: максимальное количество статей на странице или None, если количество не ограничено
     :return: список статей курса в порядке их добавления (от старых к новым)
     """
-    cursor = get_connection().cursor()
-    records = cursor.execute("""
-        SELECT a.id as a_id, a.title as a_title, a.text as a_text, u.id as u_id
+    cursor = get_read_connection().cursor()
+    records = cursor.execute(f"""
+        SELECT {_ARTICLE_COLUMNS}, {_AUTHOR_COLUMNS}
         FROM articles as a
             JOIN courses as c ON a.course_id=c.id
             JOIN users as u ON c.author_id=u.id
-        WHERE c.id = ?
-        ORDER BY a_id;
-    """, (course.id,)).fetchall()
-    return [Article(r["a_id"], r["a_title"], r["a_text"], find_user_with_id(r["u_id"]))
+        WHERE c.id = ? AND a.id > ?
+        ORDER BY a_id
+        LIMIT ?;
+    """, (course.id, after_id, _limit(limit))).fetchall()
+    return [_article_from_record(r, user_from_record(r, "u_"))
             for r in records]
 
 
+def find_article_in_course(course_id: int, article_id: int,
+                           comment_id: int = None) -> tuple[Course, Article, Comment | None] | None:
+    """
+    Получить одним запросом курс, его статью и, опционально, комментарий к этой статье вместе с их авторами
+    :param course_id: id курса
+    :param article_id: id статьи, которая должна принадлежать курсу
+    :param comment_id: id комментария (или ответа на комментарий), который должен относиться к статье,
+        или None, если комментарий не нужен
+    :return: тройка (курс, статья, комментарий или None) или None, если курса, статьи
+        или комментария с заданными id нет, статья не принадлежит курсу
+        или комментарий оставлен не к этой статье
+    """
+    record = get_read_connection().cursor().execute(f"""
+        SELECT {_COURSE_COLUMNS}, {_AUTHOR_COLUMNS},
+            {_ARTICLE_COLUMNS},
+            cm.id AS cm_id, cm.text AS cm_text,
+            cu.id AS cu_id, cu.login AS cu_login, cu.email AS cu_email, cu.password_hash AS cu_password_hash
+        FROM courses AS c
+            JOIN users AS u ON c.author_id = u.id
+            JOIN articles AS a ON a.course_id = c.id
+            LEFT JOIN comments AS cm ON cm.id = ? AND cm.root_article_id = a.id AND NOT cm.deleted
+            LEFT JOIN users AS cu ON cm.author_id = cu.id
+        WHERE c.id = ? AND a.id = ?;
+    """, (comment_id, course_id, article_id)).fetchone()
+    if record is None or (comment_id is not None and record["cm_id"] is None):
+        return None
+    course = _course_from_record(record)
+    article = _article_from_record(record, course.author)
+    comment = None
+    if comment_id is not None:
+        comment = Comment(record["cm_id"], record["cm_text"], user_from_record(record, "cu_"))
+    return course, article, comment
+
+
 def find_course_for_article(article: Article) -> Course | None:
     """
     Получить курс, которому принадлежит заданная статья
     В случае, если такого курса нет, вернуть None
     """
-    article_record = get_connection().cursor().execute("""
-        SELECT course_id
-        FROM articles
-        WHERE id = ?;
+    record = get_read_connection().cursor().execute(f"""
+        SELECT {_COURSE_COLUMNS}, {_AUTHOR_COLUMNS}
+        FROM articles AS a
+            JOIN courses AS c ON a.course_id = c.id
+            JOIN users AS u ON c.author_id = u.id
+        WHERE a.id = ?;
     """, (article.id,)).fetchone()
-    if article_record is None:
+    if record is None:
         return None
-    return find_course_with_id(article_record["course_id"])
+    return _course_from_record(record)
 
 
-def add_image(image: PILImage, article: Article, author: User):
+def add_image(image: PILImage, article: Article, author: User) -> Image:
     """
     Добавить в систему новое изображение
     :param image: добавляемое изображение в виде pillow Image
     :param article: статья, для которой добавляется изображение
     :param author: пользователь, добавляющий статью
+    :return: добавленное изображение
     """
-    connection = get_connection()
-    connection.cursor().execute("""
-        INSERT INTO images (image, author_id, article_id)
-        VALUES (?, ?, ?);
-    """, (_image_to_bytes(image), author.id, article.id))
-    connection.commit()
+    parameters = (_image_to_bytes(image), author.id, article.id)
+
+    def insert(connection):
+        return connection.cursor().execute("""
+            INSERT INTO images (image, author_id, article_id)
+            VALUES (?, ?, ?);
+        """, parameters).lastrowid
+
+    return Image(execute_write(insert), image, author)
 
 
 def find_image_with_id(id_: int) -> Image | None:
@@ -279,7 +431,7 @@ def find_image_with_id(id_: int) -> Image | None:
     :param id_:
     :return: изображение — Image или None, если изображения с данным id в системе нет
     """
-    record = get_connection().cursor().execute("""
+    record = get_read_connection().cursor().execute("""
         SELECT id, image, author_id
         FROM images
         WHERE id = ?;
@@ -297,30 +449,36 @@ def find_images_in(article: Article) -> list[Image]:
     :param article:
     :return: изображения, добавленные для заданной статьи, в порядке добавления (от старых к новым)
     """
-    records = get_connection().cursor().execute("""
+    records = get_read_connection().cursor().execute("""
         SELECT id, image, author_id
         FROM images
         WHERE article_id = ?;
     """, (article.id,)).fetchall()
+    users = get_loader(find_users_with_ids)
+    authors = [users.load(r["author_id"]) for r in records]
     return [Image(r["id"],
                   _image_from_bytes(r["image"]),
-                  find_user_with_id(r["author_id"]))
-            for r in records]
+                  author())
+            for r, author in zip(records, authors)]
 
 
-def left_comment_for(text: str, article: Article, author: User):
+def left_comment_for(text: str, article: Article, author: User) -> Comment:
     """
     Оставить комментарий к заданной статье
     :param text: текст комментария
     :param article: статья, для которой добавляется комментарий
     :param author: автор комментария
+    :return: оставленный комментарий
     """
-    connection = get_connection()
-    connection.cursor().execute("""
-        INSERT INTO comments (text, parent_article_id, author_id)
-        VALUES (?, ?, ?);
-    """, (text, article.id, author.id))
-    connection.commit()
+    parameters = (text, article.id, article.id, author.id)
+
+    def insert(connection):
+        return connection.cursor().execute("""
+            INSERT INTO comments (text, parent_article_id, root_article_id, author_id)
+            VALUES (?, ?, ?, ?);
+        """, parameters).lastrowid
+
+    return Comment(execute_write(insert), text, author)
 
 
 def reply_at_comment(text: str, comment: Comment, author: User):
@@ -335,35 +493,54 @@ def reply_at_comment(text: str, comment: Comment, author: User):
     article = find_article_comment_was_left_for(comment)
     if author != article.author:
         raise StudentsCannotReplyAtComments()
-    connection = get_connection()
-    connection.cursor().execute("""
-        INSERT INTO comments (text, parent_comment_id, author_id)
-        VALUES (?, ?, ?);
-    """, (text, comment.id, author.id))
-    connection.commit()
 
+    parameters = (text, author.id, comment.id)
+
+    def insert(connection):
+        # ответ относится к той же статье, что и комментарий, на который он даётся
+        connection.cursor().execute("""
+            INSERT INTO comments (text, parent_comment_id, root_article_id, author_id)
+            SELECT ?, id, root_article_id, ?
+            FROM comments
+            WHERE id = ?;
+        """, parameters)
+
+    execute_write(insert)
 
-def delete_comment(comment: Comment, deleter: User):
+
+def delete_comment(comment: Comment, deleter: User) -> int:
     """
-    Удалить заданный комментарий.
+    Удалить заданный комментарий вместе со всеми ответами на него (любой глубины вложенности).
     В случае, если удалить комментарий пытается не автор статьи,
         к которой он был оставлен (или не автор исходной статьи, если удаляется ответ на комментарий),
         будет выброшено StudentsCannotDeleteComments
     :param comment: удаляемый комментарий
     :param deleter: пользователь, пытающийся удалить комментарий
+    :return: количество удалённых комментариев и ответов
     """
     article = find_article_comment_was_left_for(comment)
     if deleter != article.author:
         raise StudentsCannotDeleteComments()
-    for reply in find_comments_replied_at(comment):
-        delete_comment(reply, deleter)
-    connection = get_connection()
-    connection.cursor().execute("""
-        UPDATE comments
-        SET deleted = 1
-        WHERE id = ?;
-    """, (comment.id,))
-    connection.commit()
+
+    parameters = (comment.id,)
+
+    def update(connection):
+        return connection.cursor().execute("""
+            UPDATE comments
+            SET deleted = 1
+            WHERE NOT deleted AND id IN (
+                WITH RECURSIVE thread (id) AS (
+                    SELECT ?
+                    UNION ALL
+                    SELECT c.id
+                    FROM comments AS c
+                        JOIN thread AS t ON c.parent_comment_id = t.id
+                )
+                SELECT id FROM thread
+            );
+        """, parameters).rowcount
+
+    return execute_write(update)
 
 
 def find_comment_with_id(id_: int) -> Comment | None:
@@ -372,29 +549,36 @@ def find_comment_with_id(id_: int) -> Comment | None:
     :param id_:
     :return: комментарий или None, если комментария с заданным id нет в системе
     """
-    record = get_connection().cursor().execute("""
-        SELECT id, text, author_id
-        FROM comments
-        WHERE id = ? AND NOT deleted;
+    record = get_read_connection().cursor().execute(f"""
+        SELECT c.id AS c_id, c.text AS c_text, {_AUTHOR_COLUMNS}
+        FROM comments AS c
+            JOIN users AS u ON c.author_id = u.id
+        WHERE c.id = ? AND NOT c.deleted;
     """, (id_,)).fetchone()
     if record is None:
         return None
-    return Comment(record["id"], record["text"], find_user_with_id(record["author_id"]))
+    return Comment(record["c_id"], record["c_text"], user_from_record(record, "u_"))
 
 
-def find_comments_left_for(article: Article) -> list[Comment]:
+def find_comments_left_for(article: Article, after_id: int = 0, limit: int = None) -> list[Comment]:
     """
     Получить список всех комментариев, оставленных к статье
     :param article: статья, для которой ищутся комментарии
+    :param after_id: id последнего комментария предыдущей страницы (0 — с начала списка)
+    :param limit: максимальное количество комментариев на странице или None, если количество не ограничено
     :return: список оставленных к статье комментариев, от старых к новым
     """
-    records = get_connection().cursor().execute("""
+    records = get_read_connection().cursor().execute("""
         SELECT id, text, author_id
         FROM comments
-        WHERE parent_article_id = ? AND NOT deleted;
-    """, (article.id,)).fetchall()
-    return [Comment(r["id"], r["text"], find_user_with_id(r["author_id"]))
-            for r in records]
+        WHERE parent_article_id = ? AND NOT deleted AND id > ?
+        ORDER BY id
+        LIMIT ?;
+    """, (article.id, after_id, _limit(limit))).fetchall()
+    users = get_loader(find_users_with_ids)
+    authors = [users.load(r["author_id"]) for r in records]
+    return [Comment(r["id"], r["text"], author())
+            for r, author in zip(records, authors)]
 
 
 def find_comments_replied_at(comment: Comment) -> list[Comment]:
@@ -403,30 +587,118 @@ def find_comments_replied_at(comment: Comment) -> list[Comment]:
     :param comment: комментарий, к которому ищутся ответы
     :return: список ответов к комментарию, от старых к новым
     """
-    records = get_connection().cursor().execute("""
+    records = get_read_connection().cursor().execute("""
         SELECT id, text, author_id
         FROM comments
         WHERE parent_comment_id = ? AND NOT deleted;
     """, (comment.id,)).fetchall()
-    return [Comment(r["id"], r["text"], find_user_with_id(r["author_id"]))
-            for r in records]
+    users = get_loader(find_users_with_ids)
+    authors = [users.load(r["author_id"]) for r in records]
+    return [Comment(r["id"], r["text"], author())
+            for r, author in zip(records, authors)]
 
 
-def find_comments_left_by(user: User) -> list[Comment]:
+def find_comment_tree_for(article: Article, after_id: int = 0,
+                          limit: int = None) -> OrderedDict[Comment, list[Comment]]:
+    """
+    Получить все комментарии к статье вместе с ответами на них одним запросом.
+    Ответы любой глубины вложенности (ответы на ответы и т.д.) относятся
+        к исходному комментарию к статье; ответы на удалённые комментарии не возвращаются.
+    Страницы составляются из комментариев к статье: ответы всегда возвращаются вместе с комментарием
+    :param article: статья, для которой ищутся комментарии
+    :param after_id: id последнего комментария к статье предыдущей страницы (0 — с начала списка)
+    :param limit: максимальное количество комментариев к статье на странице или None, если количество не ограничено
+    :return: словарь, ключи которого — комментарии к статье, а значения — списки ответов на них,
+        и комментарии, и ответы упорядочены от старых к новым
+    """
+    records = get_read_connection().cursor().execute(f"""
+        WITH RECURSIVE thread (id, root_id) AS (
+            SELECT id, id
+            FROM (
+                SELECT id
+                FROM comments
+                WHERE parent_article_id = ? AND NOT deleted AND id > ?
+                ORDER BY id
+                LIMIT ?
+            )
+            UNION ALL
+            SELECT c.id, t.root_id
+            FROM comments AS c
+                JOIN thread AS t ON c.parent_comment_id = t.id
+            WHERE NOT c.deleted
+        )
+        SELECT t.root_id AS root_id, c.id AS c_id, c.text AS c_text, {_AUTHOR_COLUMNS}
+        FROM thread AS t
+            JOIN comments AS c ON t.id = c.id
+            JOIN users AS u ON c.author_id = u.id
+        ORDER BY t.root_id, c.id;
+    """, (article.id, after_id, _limit(limit))).fetchall()
+    result = OrderedDict()
+    roots = {}
+    for r in records:
+        comment = Comment(r["c_id"], r["c_text"], user_from_record(r, "u_"))
+        if r["c_id"] == r["root_id"]:
+            roots[r["root_id"]] = comment
+            result[comment] = []
+        else:
+            result[roots[r["root_id"]]].append(comment)
+    return result
+
+
+def find_comments_left_by(user: User, after_id: int = 0, limit: int = None) -> list[Comment]:
     """
     Получить список комментариев и ответов к комментариям, оставленных данным пользователем
     :param user: пользователь, для которого ищутся комментарии
+    :param after_id: id последнего комментария предыдущей страницы (0 — с начала списка)
+    :param limit: максимальное количество комментариев на странице или None, если количество не ограничено
     :return: список оставленных пользователем комментариев и ответов, от старых к новым
     """
-    records = get_connection().cursor().execute("""
+    records = get_read_connection().cursor().execute("""
         SELECT id, text
         FROM comments
-        WHERE author_id = ? AND NOT deleted;
-    """, (user.id,)).fetchall()
+        WHERE author_id = ? AND NOT deleted AND id > ?
+        ORDER BY id
+        LIMIT ?;
+    """, (user.id, after_id, _limit(limit))).fetchall()
     return [Comment(r["id"], r["text"], user)
             for r in records]
 
 
+def find_comment_location(comment_id: int) -> tuple[int, int, int] | None:
+    """
+    Найти одним запросом, где на сайте находится комментарий:
+        курс и статью, к которой он был оставлен, и исходный комментарий к статье,
+        среди ответов на который находится данный (для комментария к статье — он сам)
+    :param comment_id: id комментария или ответа на комментарий
+    :return: тройка (id курса, id статьи, id исходного комментария)
+        или None, если комментария с таким id нет, он удалён или не был оставлен к какой-либо статье
+    """
+    # статья и курс находятся по root_article_id одним поиском по первичному ключу,
+    # а цепочка parent_comment_id проходится только для того, чтобы найти исходный комментарий
+    record = get_read_connection().cursor().execute("""
+        WITH RECURSIVE ancestors (id, parent_comment_id) AS (
+            SELECT id, parent_comment_id
+            FROM comments
+            WHERE id = :comment_id
+            UNION ALL
+            SELECT c.id, c.parent_comment_id
+            FROM comments AS c
+                JOIN ancestors AS an ON c.id = an.parent_comment_id
+        )
+        SELECT a.course_id AS course_id, a.id AS article_id, (
+                SELECT id
+                FROM ancestors
+                WHERE parent_comment_id IS NULL
+            ) AS root_id
+        FROM comments AS c
+            JOIN articles AS a ON a.id = c.root_article_id
+        WHERE c.id = :comment_id AND NOT c.deleted;
+    """, {"comment_id": comment_id}).fetchone()
+    if record is None:
+        return None
+    return record["course_id"], record["article_id"], record["root_id"]
+
+
 def find_article_comment_was_left_for(comment: Comment) -> Article | None:
     """
     Найти статью, к которой был оставлен комментарий.
@@ -435,19 +707,31 @@ def find_article_comment_was_left_for(comment: Comment) -> Article | None:
     :param comment: комментарий, для которого ищется исходная статья
     :return: статья или None, если комментарий не был оставлен к какой-либо статье
     """
-    record = get_connection().cursor().execute("""
-        SELECT parent_article_id, parent_comment_id
-        FROM comments
-        WHERE id = ?;
+    record = get_read_connection().cursor().execute(f"""
+        SELECT {_ARTICLE_COLUMNS}, {_AUTHOR_COLUMNS}
+        FROM comments AS cm
+            JOIN articles AS a ON cm.root_article_id = a.id
+            JOIN courses AS c ON a.course_id = c.id
+            JOIN users AS u ON c.author_id = u.id
+        WHERE cm.id = ?;
     """, (comment.id,)).fetchone()
     if record is None:
         return None
-    if record["parent_article_id"] is None:
-        if record["parent_comment_id"] is not None:
-            parent_comment = find_comment_with_id(record["parent_comment_id"])
-            return find_article_comment_was_left_for(parent_comment)
-        return None
-    return find_article_with_id(record["parent_article_id"])
+    return _article_from_record(record, user_from_record(record, "u_"))
+
+
+def _limit(limit: int | None) -> int:
+    # LIMIT -1 в SQLite означает отсутствие ограничения
+    return -1 if limit is None else limit
+
+
+def _course_from_record(record: sqlite3.Row) -> Course:
+    return Course(record["c_id"], record["c_title"], record["c_description"],
+                  user_from_record(record, "u_"), record["c_favored_count"], record["c_articles_count"])
+
+
+def _article_from_record(record: sqlite3.Row, author: User) -> Article:
+    return Article(record["a_id"], record["a_title"], record["a_text"], author, record["a_comments_count"])
 
 
 def _image_to_bytes(image: PILImage) -> bytes:
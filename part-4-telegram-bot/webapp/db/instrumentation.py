@@ -0,0 +1,132 @@
+import re
+import sqlite3
+import sys
+import time
+
+from flask import current_app, g, has_app_context, Response
+
+
+class QueryStats:
+    """
+    Статистика SQL-запросов, выполненных в рамках одного контекста приложения:
+    количество запросов (count), суммарное время их выполнения (total, в секундах)
+    и самый медленный из них (slowest_sql, slowest).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.slowest = 0.0
+        self.slowest_sql = None
+
+    def add(self, sql: str, duration: float):
+        self.count += 1
+        self.total += duration
+        if self.slowest_sql is None or duration > self.slowest:
+            self.slowest = duration
+            self.slowest_sql = normalize_sql(sql)
+
+    @property
+    def total_ms(self) -> float:
+        return self.total * 1000
+
+    @property
+    def slowest_ms(self) -> float:
+        return self.slowest * 1000
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+    Курсор, замеряющий время выполнения каждого запроса
+    и записывающий его в статистику текущего контекста приложения
+    """
+
+    def execute(self, sql, parameters=()):
+        started_at = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            record_query(sql, time.perf_counter() - started_at)
+
+    def executemany(self, sql, seq_of_parameters):
+        started_at = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            record_query(sql, time.perf_counter() - started_at)
+
+    def executescript(self, sql_script):
+        started_at = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            record_query(sql_script, time.perf_counter() - started_at)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """
+    Соединение, все курсоры которого являются InstrumentedCursor
+    """
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+def normalize_sql(sql: str) -> str:
+    return re.sub(r"\s+", " ", sql).strip()
+
+
+def get_query_stats() -> QueryStats | None:
+    """
+    Статистика запросов текущего контекста приложения
+    или None, если в нём ещё не было выполнено ни одного запроса
+    """
+    if not has_app_context():
+        return None
+    return g.get("sql_stats")
+
+
+def record_query(sql: str, duration: float):
+    """
+    Учесть выполненный запрос в статистике текущего контекста приложения.
+    Запросы, выполнявшиеся дольше SQL_SLOW_QUERY_MS миллисекунд, записываются в лог
+    :param sql: текст запроса
+    :param duration: время выполнения запроса, в секундах
+    """
+    if not has_app_context():
+        return
+    if "sql_stats" not in g:
+        g.sql_stats = QueryStats()
+    g.sql_stats.add(sql, duration)
+    threshold = current_app.config["SQL_SLOW_QUERY_MS"]
+    if threshold is not None and duration * 1000 >= threshold:
+        current_app.logger.warning("Slow query (%.1f ms) in %s: %s",
+                                   duration * 1000, _find_caller(), normalize_sql(sql))
+
+
+def add_server_timing(response: Response) -> Response:
+    stats = get_query_stats()
+    if stats is not None and current_app.config["SQL_SERVER_TIMING"]:
+        response.headers.add("Server-Timing",
+                             f'db;dur={stats.total_ms:.2f};desc="{stats.count} queries"')
+        response.headers.add("Server-Timing", f"db-slowest;dur={stats.slowest_ms:.2f}")
+    return response
+
+
+def _find_caller() -> str:
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if (module == "webapp.db" or module.startswith("webapp.db.")) and module != __name__:
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "unknown"
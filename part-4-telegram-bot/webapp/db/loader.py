@@ -0,0 +1,91 @@
+from typing import Callable, Generic, Iterable, Iterator, TypeVar
+
+from flask import g
+
+T = TypeVar("T")
+
+# количество id в одном запросе WHERE id IN (...):
+# заметно меньше ограничения SQLite на количество параметров запроса
+MAX_BATCH_SIZE = 500
+
+
+class DataLoader(Generic[T]):
+    """
+    Загрузчик, откладывающий получение объектов по id до момента, когда они действительно понадобятся.
+    Все id, запрошенные через load до этого момента, загружаются вместе
+        одним вызовом batch_load (то есть одним запросом WHERE id IN (...)),
+        а загруженные объекты запоминаются до конца текущего запроса
+    """
+
+    def __init__(self, batch_load: Callable[[list[int]], dict[int, T]]):
+        """
+        :param batch_load: функция, получающая список id и возвращающая словарь найденных объектов по их id
+        """
+        self.batch_load = batch_load
+        self._pending = set()
+        self._loaded = {}
+
+    def load(self, id_: int) -> Callable[[], T | None]:
+        """
+        Запланировать загрузку объекта с заданным id
+        :param id_: id объекта
+        :return: функция без аргументов, возвращающая объект или None, если объекта с таким id нет.
+            Первый её вызов загружает все запланированные к этому моменту объекты
+        """
+        if id_ not in self._loaded:
+            self._pending.add(id_)
+        return lambda: self.get(id_)
+
+    def get(self, id_: int) -> T | None:
+        """
+        Получить объект с заданным id, загрузив его вместе со всеми запланированными объектами
+        """
+        if id_ not in self._loaded:
+            self._pending.add(id_)
+            self.dispatch()
+        return self._loaded[id_]
+
+    def dispatch(self):
+        """
+        Загрузить все запланированные объекты
+        """
+        ids = sorted(self._pending - self._loaded.keys())
+        self._pending.clear()
+        if not ids:
+            return
+        found = self.batch_load(ids)
+        for id_ in ids:
+            self._loaded[id_] = found.get(id_)
+
+    def clear(self, id_: int):
+        """
+        Забыть загруженный объект с заданным id, чтобы следующий запрос загрузил его заново
+        """
+        self._loaded.pop(id_, None)
+
+
+def get_loader(batch_load: Callable[[list[int]], dict[int, T]]) -> DataLoader[T]:
+    """
+    Загрузчик для функции batch_load, общий для всего текущего контекста приложения
+    """
+    if "loaders" not in g:
+        g.loaders = {}
+    if batch_load not in g.loaders:
+        g.loaders[batch_load] = DataLoader(batch_load)
+    return g.loaders[batch_load]
+
+
+def batches(ids: Iterable[int]) -> Iterator[list[int]]:
+    """
+    Разбить id на списки не длиннее MAX_BATCH_SIZE для запросов WHERE id IN (...), пропустив повторы
+    """
+    unique_ids = sorted(set(ids))
+    for start in range(0, len(unique_ids), MAX_BATCH_SIZE):
+        yield unique_ids[start:start + MAX_BATCH_SIZE]
+
+
+def placeholders(batch: list) -> str:
+    """
+    Параметры запроса для WHERE id IN (...) по списку id
+    """
+    return ", ".join("?" * len(batch))
@@ -0,0 +1,80 @@
+import bisect
+import random
+import sqlite3
+import threading
+import time
+
+# границы интервалов гистограммы времени ожидания блокировки записи, в миллисекундах
+WAIT_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+class LockStats:
+    """
+    Статистика конкуренции за блокировку записи:
+    количество ожиданий блокировки дольше 1 мс (waits), полученных ошибок SQLITE_BUSY (busy),
+    повторных попыток (retries) и неудачных после всех попыток захватов (failures),
+    а также гистограмма времени ожидания блокировки.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.waits = 0
+        self.busy = 0
+        self.retries = 0
+        self.failures = 0
+        self.histogram = [0] * (len(WAIT_BUCKETS_MS) + 1)
+
+    def observe(self, waited: float, busy: int, retries: int, failed: bool):
+        with self._lock:
+            if waited * 1000 >= WAIT_BUCKETS_MS[0]:
+                self.waits += 1
+            self.busy += busy
+            self.retries += retries
+            self.failures += failed
+            self.histogram[bisect.bisect_left(WAIT_BUCKETS_MS, waited * 1000)] += 1
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            bounds = [f"<={b}ms" for b in WAIT_BUCKETS_MS] + [f">{WAIT_BUCKETS_MS[-1]}ms"]
+            return {
+                "waits": self.waits,
+                "busy": self.busy,
+                "retries": self.retries,
+                "failures": self.failures,
+                "wait-histogram": dict(zip(bounds, self.histogram))
+            }
+
+
+def is_busy(error: sqlite3.OperationalError) -> bool:
+    message = str(error)
+    return "database is locked" in message or "database is busy" in message
+
+
+def acquire_write_lock(connection: sqlite3.Connection, stats: LockStats,
+                       retries: int = 3, retry_delay: float = 0.05):
+    """
+    Начать транзакцию, сразу захватив блокировку записи (BEGIN IMMEDIATE).
+    Если база данных остаётся заблокированной дольше busy_timeout, попытка повторяется
+        не более retries раз со случайной задержкой, растущей экспоненциально от retry_delay.
+    Если блокировку так и не удалось захватить, выбрасывается исходное sqlite3.OperationalError
+    :param connection: соединение, в котором начинается транзакция
+    :param stats: статистика, в которую записываются ожидания блокировки
+    :param retries: максимальное количество повторных попыток
+    :param retry_delay: базовая задержка между попытками, в секундах
+    """
+    started_at = time.monotonic()
+    busy = 0
+    while True:
+        try:
+            connection.execute("BEGIN IMMEDIATE;")
+        except sqlite3.OperationalError as e:
+            if not is_busy(e):
+                raise
+            busy += 1
+            if busy > retries:
+                stats.observe(time.monotonic() - started_at, busy, busy - 1, True)
+                raise
+            time.sleep(random.uniform(0, retry_delay * 2 ** (busy - 1)))
+            continue
+        stats.observe(time.monotonic() - started_at, busy, busy, False)
+        return
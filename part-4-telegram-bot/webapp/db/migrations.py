@@ -0,0 +1,84 @@
+import os
+import re
+
+import click
+from flask import current_app
+
+from webapp.db import get_connection
+
+MIGRATION_FILE = re.compile(r"^(\d{4})_([a-z0-9_]+)\.sql$")
+
+
+def find_migrations() -> list[tuple[int, str, str]]:
+    """
+    Получить список миграций из каталога migrations
+    :return: список троек (номер, название, путь к файлу) в порядке возрастания номеров
+    """
+    directory = os.path.join(current_app.root_path, "migrations")
+    result = []
+    for file_name in os.listdir(directory):
+        match = MIGRATION_FILE.match(file_name)
+        if match is not None:
+            result.append((int(match[1]), match[2], os.path.join(directory, file_name)))
+    return sorted(result)
+
+
+def get_schema_version() -> int:
+    """
+    Номер последней применённой миграции или 0, если миграции ещё не применялись
+    """
+    connection = get_connection()
+    _create_schema_version_table(connection)
+    record = connection.execute("""
+        SELECT MAX(version) AS version
+        FROM schema_version;
+    """).fetchone()
+    return record["version"] or 0
+
+
+def migrate() -> list[tuple[int, str]]:
+    """
+    Применить к базе данных все ещё не применённые миграции.
+    Каждая миграция выполняется в отдельной транзакции вместе с записью в schema_version,
+        поэтому прерванная миграция не оставляет базу данных в промежуточном состоянии
+    :return: список пар (номер, название) применённых миграций
+    """
+    connection = get_connection()
+    current_version = get_schema_version()
+    applied = []
+    for version, name, path in find_migrations():
+        if version <= current_version:
+            continue
+        with open(path, encoding="utf-8") as f:
+            script = f.read()
+        current_app.logger.info("Applying migration %04d_%s", version, name)
+        try:
+            connection.executescript(f"""
+                BEGIN IMMEDIATE;
+                {script}
+                INSERT INTO schema_version (version, name) VALUES ({version}, '{name}');
+                COMMIT;
+            """)
+        except Exception:
+            if connection.in_transaction:
+                connection.rollback()
+            raise
+        applied.append((version, name))
+    return applied
+
+
+def _create_schema_version_table(connection):
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+
+
+@click.command("migrate")
+def migrate_command():
+    for version, name in migrate():
+        click.echo(f"Applied migration {version:04d}_{name}")
+    click.echo(f"Database schema version: {get_schema_version()}")
@@ -1,8 +1,10 @@
 import sqlite3
 
 from webapp import find_user_with_id
-from webapp.db import get_connection
+from webapp.db import get_read_connection, execute_write
+from webapp.db.accounting import user_from_record
 from webapp.models.accounting import User
+from webapp.models.courses import Course
 from webapp.models.notifications import TelegramAccount, Notification
 
 
@@ -27,15 +29,19 @@ def connect_telegram(user: User, account_id: int, account_username: str):
     """
     if find_telegram_for(user) is not None:
         raise UserAlreadyConnectedToTelegram()
-    connection = get_connection()
-    try:
-        connection.cursor().execute("""
-            INSERT INTO telegram_accounts(telegram_user_id, username, user_id)
-            VALUES (?, ?, ?);
-        """, (account_id, account_username, user.id))
-    except sqlite3.IntegrityError:
-        raise TelegramAlreadyConnectedToAnotherUser()
-    connection.commit()
+
+    parameters = (account_id, account_username, user.id)
+
+    def insert(connection):
+        try:
+            connection.cursor().execute("""
+                INSERT INTO telegram_accounts(telegram_user_id, username, user_id)
+                VALUES (?, ?, ?);
+            """, parameters)
+        except sqlite3.IntegrityError:
+            raise TelegramAlreadyConnectedToAnotherUser()
+
+    execute_write(insert)
 
 
 def disconnect_telegram(user: User, telegram: TelegramAccount):
@@ -44,12 +50,15 @@ def disconnect_telegram(user: User, telegram: TelegramAccount):
     :param user: пользователь, для которого отвязывается аккаунт
     :param telegram: Telegram-аккаунт, который будет отвязан от пользователя
     """
-    connection = get_connection()
-    connection.cursor().execute("""
-        DELETE FROM telegram_accounts
-        WHERE id = ? AND user_id = ?;
-    """, (telegram.id, user.id))
-    connection.commit()
+    parameters = (telegram.id, user.id)
+
+    def delete(connection):
+        connection.cursor().execute("""
+            DELETE FROM telegram_accounts
+            WHERE id = ? AND user_id = ?;
+        """, parameters)
+
+    execute_write(delete)
 
 
 def find_telegram_for(user: User) -> TelegramAccount | None:
@@ -58,7 +67,7 @@ def find_telegram_for(user: User) -> TelegramAccount | None:
     :param user: пользователь, для которого производится поиск
     :return: Telegram-аккаунт или None, если к данному пользователю не привязан аккаунт Telegram
     """
-    record = get_connection().cursor().execute("""
+    record = get_read_connection().cursor().execute("""
         SELECT id, telegram_user_id, username
         FROM telegram_accounts
         WHERE user_id = ?;
@@ -75,7 +84,7 @@ def find_telegram_with_id(telegram_id: int) -> TelegramAccount | None:
     :param telegram_id: id пользователя в Telegram
     :return: аккаунт Telegram или None, если Telegram-аккаунт с данным id не известен системе
     """
-    record = get_connection().cursor().execute("""
+    record = get_read_connection().cursor().execute("""
         SELECT id, username, user_id
         FROM telegram_accounts
         WHERE telegram_user_id = ?;
@@ -86,20 +95,49 @@ def find_telegram_with_id(telegram_id: int) -> TelegramAccount | None:
                            find_user_with_id(record["user_id"]))
 
 
-def add_notification(for_user: User, text: str, link: str = None):
+def add_notification(for_user: User, text: str, link: str = None) -> Notification:
     """
     Создать в базе данных запись о том,
     что пользователю нужно отправить уведомление с заданным текстом и, опционально, ссылкой.
     :param for_user: пользователь-адресат уведомления
     :param text: текст уведомления
     :param link: ссылка, которая будет приложена к уведомлению
+    :return: созданное уведомление
     """
-    connection = get_connection()
-    connection.cursor().execute("""
-        INSERT INTO notifications (text, link, user_id)
-        VALUES (?, ?, ?); 
-    """, (text, link, for_user.id))
-    connection.commit()
+    parameters = (text, link, for_user.id)
+
+    def insert(connection):
+        return connection.cursor().execute("""
+            INSERT INTO notifications (text, link, user_id)
+            VALUES (?, ?, ?); 
+        """, parameters).lastrowid
+
+    return Notification(execute_write(insert), text, for_user, link)
+
+
+def notify_course_subscribers(course: Course, text: str, link: str = None) -> int:
+    """
+    Создать уведомление с заданным текстом и, опционально, ссылкой
+        для каждого пользователя, добавившего курс в избранное и привязавшего Telegram-аккаунт.
+    Все уведомления создаются одним запросом в одной транзакции
+    :param course: курс, о событии в котором уведомляются пользователи
+    :param text: текст уведомления
+    :param link: ссылка, которая будет приложена к уведомлению
+    :return: количество созданных уведомлений
+    """
+    parameters = (text, link, course.id)
+
+    def insert(connection):
+        return connection.cursor().execute("""
+            INSERT INTO notifications (text, link, user_id)
+            SELECT ?, ?, f.user_id
+            FROM courses_favored_by_users AS f
+                JOIN telegram_accounts AS t ON f.user_id = t.user_id
+            WHERE f.course_id = ?
+            ORDER BY f.user_id;
+        """, parameters).rowcount
+
+    return execute_write(insert)
 
 
 def find_notification_with_id(id_: int) -> Notification | None:
@@ -108,7 +146,7 @@ def find_notification_with_id(id_: int) -> Notification | None:
     :param id_: id уведомления
     :return: уведомление или None, если уведомление с данным id не известно системе
     """
-    record = get_connection().cursor().execute("""
+    record = get_read_connection().cursor().execute("""
         SELECT id, text, link, user_id 
         FROM notifications
         WHERE id = ?;
@@ -123,26 +161,57 @@ def get_pending_notifications() -> list[Notification]:
     """
     Получить список всех ещё не доставленных уведомлений, от более старых к более новым.
     """
-    records = get_connection().cursor().execute("""
-        SELECT id, text, link, user_id
-        FROM notifications
-        WHERE NOT delivered
-        ORDER BY id;
+    records = get_read_connection().cursor().execute("""
+        SELECT n.id AS n_id, n.text AS n_text, n.link AS n_link,
+            u.id AS u_id, u.login AS u_login, u.email AS u_email, u.password_hash AS u_password_hash
+        FROM notifications AS n
+            JOIN users AS u ON n.user_id = u.id
+        WHERE NOT n.delivered
+        ORDER BY n.id;
     """).fetchall()
-    return [Notification(record["id"], record["text"],
-                         find_user_with_id(record["user_id"]), record["link"])
+    return [Notification(record["n_id"], record["n_text"],
+                         user_from_record(record, "u_"), record["n_link"])
             for record in records]
 
 
+def get_pending_deliveries() -> list[tuple[Notification, TelegramAccount]]:
+    """
+    Получить список ещё не доставленных уведомлений вместе с Telegram-аккаунтами их адресатов,
+        от более старых к более новым.
+    Уведомления пользователей, не привязавших Telegram-аккаунт, не возвращаются
+    :return: список пар (уведомление, Telegram-аккаунт адресата)
+    """
+    records = get_read_connection().cursor().execute("""
+        SELECT n.id AS n_id, n.text AS n_text, n.link AS n_link,
+            t.id AS t_id, t.telegram_user_id AS t_telegram_user_id, t.username AS t_username,
+            u.id AS u_id, u.login AS u_login, u.email AS u_email, u.password_hash AS u_password_hash
+        FROM notifications AS n
+            JOIN users AS u ON n.user_id = u.id
+            JOIN telegram_accounts AS t ON t.user_id = u.id
+        WHERE NOT n.delivered
+        ORDER BY n.id;
+    """).fetchall()
+    result = []
+    for record in records:
+        user = user_from_record(record, "u_")
+        result.append((Notification(record["n_id"], record["n_text"], user, record["n_link"]),
+                       TelegramAccount(record["t_id"], record["t_telegram_user_id"],
+                                       record["t_username"], user)))
+    return result
+
+
 def mark_delivered(notification: Notification):
     """
     Отметить уведомление как доставленное
     :param notification: уведомление, которое было доставлено
     """
-    connection = get_connection()
-    connection.cursor().execute("""
-        UPDATE notifications
-        SET delivered = 1
-        WHERE id = ?;
-    """, (notification.id,))
-    connection.commit()
+    parameters = (notification.id,)
+
+    def update(connection):
+        connection.cursor().execute("""
+            UPDATE notifications
+            SET delivered = 1
+            WHERE id = ?;
+        """, parameters)
+
+    execute_write(update)
@@ -0,0 +1,134 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable
+
+
+class PoolExhausted(Exception):
+    pass
+
+
+class ConnectionPool:
+    """
+    Ограниченный потокобезопасный пул соединений с базой данных.
+    Соединения не открываются и не закрываются для каждого запроса,
+    а выдаются методом checkout и возвращаются в пул методом checkin.
+    Пул открывает не более size соединений; если все они заняты,
+    checkout ждёт освобождения одного из них не дольше timeout секунд.
+    После fork дочерний процесс получает новый пустой пул.
+    """
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection],
+                 size: int = 5, timeout: float = 5.0):
+        """
+        :param connect: функция, открывающая новое соединение с базой данных
+        :param size: максимальное количество одновременно открытых соединений
+        :param timeout: максимальное время ожидания свободного соединения, в секундах
+        """
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._condition = threading.Condition(threading.Lock())
+        self._idle = []
+        self._opened = 0
+        self._checkouts = 0
+        self._exhausted = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _check_pid(self):
+        # соединения SQLite нельзя использовать в процессе, отличном от того,
+        # в котором они были открыты, поэтому после fork пул создаётся заново
+        if self._pid != os.getpid():
+            self._reset()
+
+    def checkout(self) -> sqlite3.Connection:
+        """
+        Получить соединение из пула.
+        В случае, если за timeout секунд свободное соединение так и не появилось,
+            будет выброшено PoolExhausted
+        :return: соединение с базой данных
+        """
+        self._check_pid()
+        started_at = time.monotonic()
+        deadline = started_at + self.timeout
+        with self._condition:
+            if not self._idle and self._opened >= self.size:
+                self._exhausted += 1
+            while not self._idle and self._opened >= self.size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolExhausted()
+                self._condition.wait(remaining)
+            connection = self._idle.pop() if self._idle else None
+            if connection is None:
+                self._opened += 1
+            waited = time.monotonic() - started_at
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        if connection is None:
+            try:
+                connection = self._connect()
+            except Exception:
+                self._discard()
+                raise
+        return connection
+
+    def checkin(self, connection: sqlite3.Connection):
+        """
+        Вернуть соединение в пул.
+        Незавершённая транзакция откатывается, а сломанное соединение закрывается
+        :param connection: соединение, ранее полученное методом checkout
+        """
+        if self._pid != os.getpid():
+            return
+        try:
+            connection.rollback()
+        except sqlite3.Error:
+            connection.close()
+            self._discard()
+            return
+        with self._condition:
+            self._idle.append(connection)
+            self._condition.notify()
+
+    def _discard(self):
+        with self._condition:
+            self._opened -= 1
+            self._condition.notify()
+
+    def close(self):
+        """
+        Закрыть все свободные соединения пула
+        """
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self._opened -= len(idle)
+        for connection in idle:
+            connection.close()
+
+    def stats(self) -> dict:
+        """
+        Статистика использования пула: количество выдач соединений,
+        случаев исчерпания пула и превышения времени ожидания,
+        суммарное и максимальное время ожидания соединения (в секундах)
+        """
+        with self._condition:
+            return {
+                "size": self.size,
+                "opened": self._opened,
+                "idle": len(self._idle),
+                "checkouts": self._checkouts,
+                "exhausted": self._exhausted,
+                "timeouts": self._timeouts,
+                "wait-total": self._wait_total,
+                "wait-max": self._wait_max
+            }
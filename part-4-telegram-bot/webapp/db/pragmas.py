@@ -0,0 +1,63 @@
+import sqlite3
+
+# Профили настроек SQLite, применяемых к каждому открываемому соединению.
+# statement_cache_size — не PRAGMA, а размер кэша подготовленных выражений
+#   модуля sqlite3 (параметр cached_statements функции sqlite3.connect)
+PROFILES = {
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -2000,
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "busy_timeout": 5000,
+        "statement_cache_size": 128
+    },
+    "balanced": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -16000,
+        "mmap_size": 64 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+        "statement_cache_size": 256
+    },
+    "fast": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "cache_size": -64000,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+        "statement_cache_size": 512
+    }
+}
+
+
+def resolve_pragmas(profile: str, overrides: dict = None) -> dict:
+    """
+    Получить настройки SQLite для заданного профиля с учётом переопределённых значений.
+    В случае, если профиль с таким названием не известен, будет выброшено ValueError
+    :param profile: название профиля ("durable", "balanced" или "fast")
+    :param overrides: настройки, значения которых заменяют значения из профиля
+    :return: словарь с названиями и значениями настроек
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown SQLite profile '{profile}', expected one of: {', '.join(PROFILES)}")
+    return {**PROFILES[profile], **(overrides or {})}
+
+
+def apply_pragmas(connection: sqlite3.Connection, pragmas: dict):
+    """
+    Применить настройки к открытому соединению
+    :param connection: соединение с базой данных
+    :param pragmas: настройки, полученные с помощью resolve_pragmas
+    """
+    for name, value in pragmas.items():
+        if name == "statement_cache_size":
+            continue
+        connection.execute(f"PRAGMA {name} = {value};")
+
+
+def describe_pragmas(pragmas: dict) -> str:
+    return ", ".join(f"{name}={value}" for name, value in pragmas.items())
@@ -0,0 +1,78 @@
+from webapp.db import get_read_connection
+from webapp.models.accounting import User
+from webapp.models.courses import Course
+from webapp.models.notifications import TelegramAccount
+from webapp.models.profile import CommentSnippet, ProfileSummary
+
+# количество символов комментария, показываемых на странице пользователя
+SNIPPET_LENGTH = 30
+
+
+def find_profile_summary(user: User, page_size: int, courses_after: int = 0,
+                         comments_before: int = None, snippet_length: int = SNIPPET_LENGTH) -> ProfileSummary:
+    """
+    Получить одним запросом всё, что показывается на странице пользователя:
+    страницу созданных им курсов, страницу его последних комментариев и привязанный Telegram-аккаунт.
+    Комментарии обрезаются до snippet_length символов на стороне SQLite,
+        поэтому полный текст длинных комментариев не загружается
+    :param user: пользователь, страница которого показывается
+    :param page_size: количество курсов и комментариев на странице
+    :param courses_after: id последнего курса предыдущей страницы курсов (0 — с начала списка)
+    :param comments_before: id последнего комментария предыдущей страницы комментариев
+        (None — начиная с самого нового)
+    :param snippet_length: количество символов комментария, загружаемых для показа
+    :return: ProfileSummary с курсами в порядке создания (от старых к новым)
+        и комментариями от новых к старым
+    """
+    # строки курсов, комментариев и Telegram-аккаунта различаются столбцом kind,
+    # название курса, название статьи комментария и username Telegram-аккаунта хранятся в столбце title.
+    # Части UNION ALL с курсами и комментариями ограничены page_size + 1 строками:
+    # лишняя строка показывает, что есть следующая страница
+    records = get_read_connection().cursor().execute("""
+        SELECT *
+        FROM (
+            SELECT 'course' AS kind, id, title, description AS text, NULL AS truncated,
+                favored_count, articles_count, NULL AS article_id, NULL AS course_id, NULL AS telegram_user_id
+            FROM courses
+            WHERE author_id = :user_id AND id > :courses_after
+            ORDER BY id
+            LIMIT :limit
+        )
+        UNION ALL
+        SELECT *
+        FROM (
+            SELECT 'comment', c.id, a.title, substr(c.text, 1, :snippet_length),
+                length(c.text) > :snippet_length, NULL, NULL, c.root_article_id, a.course_id, NULL
+            FROM comments AS c
+                LEFT JOIN articles AS a ON a.id = c.root_article_id
+            WHERE c.author_id = :user_id AND NOT c.deleted
+                AND (:comments_before IS NULL OR c.id < :comments_before)
+            ORDER BY c.id DESC
+            LIMIT :limit
+        )
+        UNION ALL
+        SELECT 'telegram', id, username, NULL, NULL, NULL, NULL, NULL, NULL, telegram_user_id
+        FROM telegram_accounts
+        WHERE user_id = :user_id;
+    """, {
+        "user_id": user.id,
+        "courses_after": courses_after,
+        "comments_before": comments_before,
+        "snippet_length": snippet_length,
+        "limit": page_size + 1
+    }).fetchall()
+    courses, comments, telegram_account = [], [], None
+    for r in records:
+        if r["kind"] == "course":
+            courses.append(Course(r["id"], r["title"], r["text"], user, r["favored_count"], r["articles_count"]))
+        elif r["kind"] == "comment":
+            comments.append(CommentSnippet(r["id"], r["text"], bool(r["truncated"]),
+                                           r["article_id"], r["title"], r["course_id"]))
+        else:
+            telegram_account = TelegramAccount(r["id"], r["telegram_user_id"], r["title"], user)
+    # порядок строк в результате UNION ALL не гарантируется, поэтому части сортируются отдельно
+    courses.sort(key=lambda c: c.id)
+    comments.sort(key=lambda c: c.id, reverse=True)
+    return ProfileSummary(courses[:page_size], len(courses) > page_size,
+                          comments[:page_size], len(comments) > page_size,
+                          telegram_account)
@@ -0,0 +1,127 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable
+
+from flask import Flask
+
+
+class GroupCommitWriter:
+    """
+    Поток, выполняющий операции записи в базу данных от имени потоков-обработчиков запросов.
+    Операции, поступившие в течение window секунд (но не более max_batch штук),
+        выполняются в одной транзакции и сохраняются одним COMMIT.
+    Каждая операция выполняется внутри собственной точки сохранения (SAVEPOINT),
+        поэтому исключение в одной операции откатывает только её
+        и передаётся вызвавшему её потоку, не затрагивая остальные операции пакета.
+    """
+
+    def __init__(self, app: Flask, window: float = 0.005, max_batch: int = 64):
+        """
+        :param app: приложение, в контексте которого работает поток записи
+        :param window: время ожидания операций для формирования пакета, в секундах
+        :param max_batch: максимальное количество операций в одном пакете
+        """
+        self.app = app
+        self.window = window
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._queue = queue.Queue()
+        self._thread = None
+        self._operations = 0
+        self._commits = 0
+
+    def submit(self, operation: Callable[[sqlite3.Connection], object]):
+        """
+        Выполнить операцию в потоке записи и дождаться сохранения её результата.
+        Исключение, выброшенное операцией или при сохранении пакета, выбрасывается повторно
+        :param operation: функция, выполняющая запись с помощью переданного ей соединения
+        :return: результат, возвращённый операцией
+        """
+        self._ensure_started()
+        future = Future()
+        self._queue.put((operation, future))
+        return future.result()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                self._thread.start()
+
+    def close(self):
+        """
+        Остановить поток записи, дождавшись выполнения уже поставленных в очередь операций
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None and self._pid == os.getpid():
+            self._queue.put(None)
+            thread.join()
+
+    def _run(self):
+        from webapp.db import get_connection
+        with self.app.app_context():
+            connection = get_connection()
+            running = True
+            while running:
+                batch = [self._queue.get()]
+                deadline = time.monotonic() + self.window
+                while len(batch) < self.max_batch and batch[-1] is not None:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        batch.append(self._queue.get(timeout=remaining) if remaining > 0
+                                     else self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if batch[-1] is None:
+                    running = False
+                    batch.pop()
+                if batch:
+                    self._execute_batch(connection, batch)
+
+    def _execute_batch(self, connection: sqlite3.Connection, batch: list):
+        from webapp.db import begin_write
+        results = []
+        try:
+            begin_write(connection)
+            for operation, future in batch:
+                connection.execute("SAVEPOINT operation;")
+                try:
+                    results.append((future, operation(connection)))
+                    connection.execute("RELEASE operation;")
+                except Exception as e:
+                    connection.execute("ROLLBACK TO operation;")
+                    connection.execute("RELEASE operation;")
+                    future.set_exception(e)
+            connection.commit()
+        except Exception as e:
+            if connection.in_transaction:
+                connection.rollback()
+            for operation, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            self.app.logger.exception("Group commit of %s operations failed", len(batch))
+            return
+        self._operations += len(batch)
+        self._commits += 1
+        for future, result in results:
+            future.set_result(result)
+
+    def stats(self) -> dict:
+        """
+        Статистика потока записи: количество выполненных операций и количество COMMIT
+        """
+        return {
+            "operations": self._operations,
+            "commits": self._commits
+        }
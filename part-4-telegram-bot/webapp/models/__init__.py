@@ -0,0 +1,48 @@
+class Model:
+    """
+    Базовый класс объектов, хранящихся в базе данных.
+    Поля объектов перечисляются в __slots__ наследников, поэтому объекты не хранят __dict__.
+    Объекты равны, если они одного типа и имеют одинаковый id, хэш также вычисляется по id,
+        поэтому объекты можно быстро искать в множествах и использовать как ключи словарей.
+    Для сравнения всех полей (например, в тестах) используется same_as
+    """
+
+    __slots__ = ("id",)
+
+    def __eq__(self, other):
+        if not isinstance(other, Model):
+            return NotImplemented
+        # __class__, а не type(): прокси вроде current_user сообщает класс объекта, к которому обращается
+        return self.__class__ is other.__class__ and self.id == other.id
+
+    def __hash__(self):
+        return hash((type(self).__name__, self.id))
+
+    def __repr__(self):
+        return f"{type(self).__name__}(id={self.id!r})"
+
+    def same_as(self, other) -> bool:
+        """
+        Совпадают ли у объектов тип и значения всех полей, включая поля вложенных объектов
+        """
+        return type(self) is type(other) and \
+            all(same_models(getattr(self, name), getattr(other, name)) for name in self._field_names())
+
+    @classmethod
+    def _field_names(cls) -> list[str]:
+        return [name for klass in reversed(cls.__mro__) for name in getattr(klass, "__slots__", ())]
+
+
+def same_models(first, second) -> bool:
+    """
+    Сравнить значения, сравнивая все поля объектов Model (в том числе внутри списков, кортежей и словарей)
+    """
+    if isinstance(first, Model):
+        return first.same_as(second)
+    if isinstance(first, (list, tuple)):
+        return type(first) is type(second) and len(first) == len(second) and \
+            all(same_models(a, b) for a, b in zip(first, second))
+    if isinstance(first, dict):
+        return isinstance(second, dict) and first.keys() == second.keys() and \
+            all(same_models(first[key], second[key]) for key in first)
+    return first == second
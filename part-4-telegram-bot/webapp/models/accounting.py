@@ -1,22 +1,43 @@
 from hashlib import sha256
 
-from flask_login import UserMixin
 from werkzeug.security import check_password_hash, generate_password_hash
 
+from webapp.models import Model
 
-class User(UserMixin):
+
+class User(Model):
     """
     Пользователь, зарегистрированный в системе.
     О пользователе известны login и email.
     Для проверки пароля можно использовать метод check_password.
+    Свойства is_authenticated, is_active, is_anonymous и метод get_id нужны Flask-Login;
+        они реализованы здесь, а не взяты из UserMixin, потому что UserMixin не объявляет __slots__
+        и добавил бы каждому пользователю __dict__
     """
 
+    __slots__ = ("login", "email", "password_hash")
+
     def __init__(self, id_, login, email, password_hash):
         self.id = id_
         self.login = login
         self.email = email
         self.password_hash = password_hash
 
+    @property
+    def is_authenticated(self) -> bool:
+        return True
+
+    @property
+    def is_active(self) -> bool:
+        return True
+
+    @property
+    def is_anonymous(self) -> bool:
+        return False
+
+    def get_id(self) -> str:
+        return str(self.id)
+
     def check_password(self, password: str) -> bool:
         return check_password_hash(self.password_hash, password)
 
@@ -29,9 +50,3 @@ class User(UserMixin):
 
     def is_verification_code_valid(self, verification_code: str) -> bool:
         return verification_code == self.get_verification_code()
-
-    def __eq__(self, other):
-        return isinstance(other, type(self)) and\
-            self.id == other.id and\
-            self.login == other.login and\
-            self.email == other.email
@@ -1,75 +1,67 @@
 from PIL import Image as PILImage
 
+from webapp.models import Model, same_models
 from webapp.models.accounting import User
 
 
-class Course:
+class Course(Model):
     """
     Курс, созданный пользователем (author) и хранящийся в системе.
-    Содержит информацию о названии (title) и описании курса (description).
+    Содержит информацию о названии (title) и описании курса (description),
+    а также количество добавивших курс в избранное (favored_count) и количество статей курса (articles_count).
     """
 
-    def __init__(self, id_: int, title: str, description: str, author: User):
+    __slots__ = ("title", "description", "author", "favored_count", "articles_count")
+
+    def __init__(self, id_: int, title: str, description: str, author: User,
+                 favored_count: int = 0, articles_count: int = 0):
         self.id = id_
         self.title = title
         self.description = description
         self.author = author
-
-    def __eq__(self, other):
-        return isinstance(other, type(self)) and\
-            self.id == other.id and\
-            self.title == other.title and\
-            self.description == other.description and\
-            self.author == other.author
+        self.favored_count = favored_count
+        self.articles_count = articles_count
 
 
-class Article:
+class Article(Model):
     """
     Статья, добавленная пользователем (author) и хранящаяся в системе.
-    Содержит информацию о названии (title), а также текст статьи (text).
+    Содержит информацию о названии (title), текст статьи (text)
+    и количество комментариев к статье вместе с ответами на них (comments_count).
     """
 
-    def __init__(self, id_: int, title: str, text: str, author: User):
+    __slots__ = ("title", "text", "author", "comments_count")
+
+    def __init__(self, id_: int, title: str, text: str, author: User, comments_count: int = 0):
         self.id = id_
         self.title = title
         self.text = text
         self.author = author
-
-    def __eq__(self, other):
-        return isinstance(other, type(self)) and \
-            self.id == other.id and \
-            self.title == other.title and \
-            self.text == other.text and \
-            self.author == other.author
+        self.comments_count = comments_count
 
 
-class Comment:
+class Comment(Model):
     """
     Комментарий, оставленный пользователем (author) и хранящийся в системе.
-    СОдержит информацию о тексте комментария (text).
+    Содержит информацию о тексте комментария (text).
     """
 
+    __slots__ = ("text", "author")
+
     def __init__(self, id_: int, text: str, author: User):
         self.id = id_
         self.text = text
         self.author = author
 
-    def __hash__(self):
-        return hash(self.id) + hash(self.text)
 
-    def __eq__(self, other):
-        return isinstance(other, type(self)) and \
-            self.id == other.id and \
-            self.text == other.text and \
-            self.author == other.author
-
-
-class Image:
+class Image(Model):
     """
     Изображение, добавленное пользователем (author) к одной из статей и хранящееся в системе.
     Само изображение хранится с помощью Image из библиотеки Pillow
     """
 
+    __slots__ = ("image", "author")
+
     def __init__(self, id_: int, image: PILImage, author: User):
         self.id = id_
         self.image = image
@@ -78,8 +70,9 @@ class Image:
     def _to_rgb(self):
         return self.image.getdata()
 
-    def __eq__(self, other):
-        return isinstance(other, type(self)) and\
-            self.id == other.id and\
-            self.author == other.author and\
-            self._to_rgb() == other._to_rgb()
+    def same_as(self, other) -> bool:
+        # изображения сравниваются по пикселям, а не по объектам Pillow
+        return isinstance(other, type(self)) and \
+            self.id == other.id and \
+            same_models(self.author, other.author) and \
+            list(self._to_rgb()) == list(other._to_rgb())
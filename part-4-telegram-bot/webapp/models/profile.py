@@ -0,0 +1,43 @@
+from webapp.models import Model
+from webapp.models.courses import Course
+from webapp.models.notifications import TelegramAccount
+
+
+class CommentSnippet(Model):
+    """
+    Начало текста комментария (text), оставленного пользователем, для показа в списке его комментариев.
+    Если текст комментария длиннее, флаг truncated установлен.
+    Также известны id статьи (article_id), к которой оставлен комментарий, её название (article_title)
+    и id курса (course_id), которому принадлежит статья.
+    """
+
+    __slots__ = ("text", "truncated", "article_id", "article_title", "course_id")
+
+    def __init__(self, id_: int, text: str, truncated: bool,
+                 article_id: int | None, article_title: str | None, course_id: int | None):
+        self.id = id_
+        self.text = text
+        self.truncated = truncated
+        self.article_id = article_id
+        self.article_title = article_title
+        self.course_id = course_id
+
+
+class ProfileSummary:
+    """
+    Всё, что показывается на странице пользователя:
+    страница созданных им курсов (courses), страница его последних комментариев (comments)
+    и привязанный Telegram-аккаунт (telegram_account, None, если аккаунт не привязан).
+    Флаги has_more_courses и has_more_comments показывают, есть ли следующие страницы курсов и комментариев.
+    """
+
+    __slots__ = ("courses", "has_more_courses", "comments", "has_more_comments", "telegram_account")
+
+    def __init__(self, courses: list[Course], has_more_courses: bool,
+                 comments: list[CommentSnippet], has_more_comments: bool,
+                 telegram_account: TelegramAccount | None):
+        self.courses = courses
+        self.has_more_courses = has_more_courses
+        self.comments = comments
+        self.has_more_comments = has_more_comments
+        self.telegram_account = telegram_account
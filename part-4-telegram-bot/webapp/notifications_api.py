@@ -77,19 +77,12 @@ def connect_account(id_: int):
 
 @notifications_api.route("/pending-notifications")
 def get_pending_notifications():
-    result = []
-    notifications = db.get_pending_notifications()
-    for notification in notifications:
-        account = db.find_telegram_for(notification.user)
-        if account is None:
-            continue
-        result.append({
-            "notification": notification.to_json(),
-            "account": account.to_json()
-        })
     return {
         "success": True,
-        "notifications": result
+        "notifications": [{
+            "notification": notification.to_json(),
+            "account": account.to_json()
+        } for notification, account in db.get_pending_deliveries()]
     }
 
 
@@ -3,3 +3,18 @@ from werkzeug.datastructures import FileStorage
 
 def _is_image(storage: FileStorage):
     return storage.content_type.split('/')[0] == "image"
+
+
+def split_page(items, page_size: int):
+    """
+    Отделить страницу от элементов, полученных с запасом в один элемент (limit=page_size + 1)
+    :param items: список или OrderedDict, содержащий не больше page_size + 1 элементов
+    :param page_size: размер страницы
+    :return: пара (элементы страницы, есть ли следующая страница)
+    """
+    if len(items) <= page_size:
+        return items, False
+    if isinstance(items, dict):
+        items.popitem()
+        return items, True
+    return items[:page_size], True